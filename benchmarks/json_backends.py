@@ -0,0 +1,47 @@
+"""Compare the JSON backends of `LocalFileReader` on a synthetic xochitl library.
+
+    python -m benchmarks.json_backends --documents 200 --pages 50
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_library import write_benchmark_library
+from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.json_backend import JSON_BACKENDS
+
+
+def time_library_read(local_fs: LocalFileReader, document_ids: list[str]) -> float:
+    start_time = time.perf_counter()
+    local_fs.read_all_metadata_files(["visibleName"])
+    local_fs.read_all_content_files(["pages", "redirectionPageMap"])
+    for document_id in document_ids:
+        local_fs.read_document_highlights(document_id)
+    return time.perf_counter() - start_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--highlights", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        document_ids = write_benchmark_library(Path(data_folder), arguments, with_pdf=False)
+        files_count = len(document_ids) * (arguments.pages + 2)
+        for json_backend in JSON_BACKENDS.values():
+            local_fs = LocalFileReader(Path(data_folder), json_backend=json_backend)
+            best_seconds = min(
+                time_library_read(local_fs, document_ids) for _ in range(arguments.repeat)
+            )
+            print(
+                f"{json_backend.name:>8}: {best_seconds:.3f}s for {files_count} files"
+                f" ({files_count / best_seconds:.0f} files/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
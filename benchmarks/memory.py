@@ -0,0 +1,79 @@
+"""Measure the memory retained by the models of a synthetic xochitl library loaded at once.
+
+    python -m benchmarks.memory --documents 200 --pages 100 --highlights 10
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic_library import write_benchmark_library
+from highlights_extractor.model_utils import get_page_number
+from highlights_extractor.models import (
+    DocumentContent,
+    DocumentMetadata,
+    PageHighlights,
+)
+from highlights_extractor.repository.file_reader import LocalFileReader
+
+
+def load_library(local_fs: LocalFileReader, document_ids: list[str]) -> list:
+    """Load the metadata, content and page highlights of every document, without images."""
+    models: list = [
+        DocumentMetadata(metadata_file)
+        for metadata_file in local_fs.read_all_metadata_files(["visibleName"])
+    ]
+    for document_id in document_ids:
+        document_content = DocumentContent(local_fs.read_document_content(document_id))
+        models.append(document_content)
+        models.extend(
+            PageHighlights(highlight_file, get_page_number(document_content, highlight_file))
+            for highlight_file in local_fs.read_document_highlights(document_id)
+        )
+    return models
+
+
+def get_resident_bytes() -> int:
+    # resident pages are the second field of statm, only available on Linux
+    with open("/proc/self/statm", encoding="utf-8") as statm_file:
+        return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--highlights", type=int, default=10)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        document_ids = write_benchmark_library(Path(data_folder), arguments, with_pdf=False)
+        local_fs = LocalFileReader(Path(data_folder))
+        gc.collect()
+        resident_bytes = get_resident_bytes()
+        models = load_library(local_fs, document_ids)
+        gc.collect()
+        resident_bytes = get_resident_bytes() - resident_bytes
+        # loaded again while tracing the allocations, as tracing them takes memory too
+        del models
+        gc.collect()
+        tracemalloc.start()
+        models = load_library(local_fs, document_ids)
+        gc.collect()
+        retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    highlights_count = len(document_ids) * arguments.pages * arguments.highlights
+    print(
+        f"{len(models)} models of {highlights_count} highlights:"
+        f" {retained_bytes / 2**20:.1f} MiB retained"
+        f" ({retained_bytes / highlights_count:.0f} bytes per highlight),"
+        f" {peak_bytes / 2**20:.1f} MiB peak while loading,"
+        f" {resident_bytes / 2**20:.1f} MiB more resident memory"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Time each stage of an export on a synthetic xochitl library, and save the results as JSON.
+
+    python -m benchmarks.run_benchmarks --documents 20 --pages 50 --output results.json
+    python -m benchmarks.run_benchmarks --compare results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+from benchmarks.synthetic_library import write_benchmark_library
+from highlights_extractor.model_utils import get_document_highlights, get_page_number
+from highlights_extractor.models import (
+    DEFAULT_CLIP_PADDING,
+    Document,
+    DocumentContent,
+    DocumentMetadata,
+    ImageExportOptions,
+)
+from highlights_extractor.process_documents import PDFExtractor
+from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
+
+
+@dataclass
+class BenchmarkResult:
+    items: int
+    repeat: int
+    min_seconds: float
+    median_seconds: float
+    mean_seconds: float
+
+
+def time_benchmark(function: Callable[[], int], repeat: int) -> BenchmarkResult:
+    """Call `function` `repeat` times, it returns the number of items it processed."""
+    durations = []
+    items = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        items = function()
+        durations.append(time.perf_counter() - start_time)
+    return BenchmarkResult(
+        items, repeat, min(durations), statistics.median(durations), statistics.mean(durations)
+    )
+
+
+def run_benchmarks(
+    data_folder: Path,
+    document_ids: list[str],
+    vault_path: Path,
+    repeat: int,
+    rendered_pages: int,
+) -> dict[str, BenchmarkResult]:
+    local_fs = LocalFileReader(data_folder)
+    return {
+        **_time_library_reading(local_fs, document_ids, repeat),
+        **_time_page_images(local_fs, document_ids[0], vault_path, repeat, rendered_pages),
+        **_time_export(local_fs, vault_path, repeat),
+    }
+
+
+def _get_page_numbers(local_fs: LocalFileReader, document_id: str) -> list[int]:
+    document_content = DocumentContent(local_fs.read_document_content(document_id))
+    return [
+        get_page_number(document_content, highlight_file)
+        for highlight_file in local_fs.read_document_highlights(document_id)
+    ]
+
+
+def _time_library_reading(
+    local_fs: LocalFileReader, document_ids: list[str], repeat: int
+) -> dict[str, BenchmarkResult]:
+    def read_library() -> int:
+        local_fs.read_all_metadata_files(["visibleName"])
+        for document_id in document_ids:
+            local_fs.read_document_content(document_id)
+            local_fs.read_document_highlights(document_id)
+        return len(document_ids)
+
+    documents_content = {
+        document_id: DocumentContent(local_fs.read_document_content(document_id))
+        for document_id in document_ids
+    }
+    documents_highlights = {
+        document_id: local_fs.read_document_highlights(document_id) for document_id in document_ids
+    }
+    page_numbers = {
+        document_id: _get_page_numbers(local_fs, document_id) for document_id in document_ids
+    }
+
+    def resolve_page_numbers() -> int:
+        for document_id in document_ids:
+            for highlight_file in documents_highlights[document_id]:
+                get_page_number(documents_content[document_id], highlight_file)
+        return sum(len(page_numbers[document_id]) for document_id in document_ids)
+
+    def resolve_chapters() -> int:
+        for document_id in document_ids:
+            # a new reader per document, so that its table of contents is parsed again
+            pdf_reader = PDFExtractor(local_fs.get_document_pdf_path(document_id), document_id)
+            pdf_reader.get_chapter_titles(page_numbers[document_id])
+        return sum(len(page_numbers[document_id]) for document_id in document_ids)
+
+    return {
+        "read_library": time_benchmark(read_library, repeat),
+        "resolve_page_numbers": time_benchmark(resolve_page_numbers, repeat),
+        "resolve_chapters": time_benchmark(resolve_chapters, repeat),
+    }
+
+
+def _time_page_images(
+    local_fs: LocalFileReader,
+    document_id: str,
+    vault_path: Path,
+    repeat: int,
+    rendered_pages: int,
+) -> dict[str, BenchmarkResult]:
+    pdf_reader = PDFExtractor(local_fs.get_document_pdf_path(document_id), document_id)
+    pages_to_render = list(
+        zip(
+            _get_page_numbers(local_fs, document_id),
+            local_fs.read_document_highlights(document_id),
+        )
+    )[:rendered_pages]
+
+    def render_page_images() -> int:
+        for page_number, highlight_file in pages_to_render:
+            pdf_reader.get_page_image(page_number, highlight_file)
+        return len(pages_to_render)
+
+    images_path = vault_path / "images"
+    images_path.mkdir()
+
+    def save_page_images(export_options: ImageExportOptions) -> Callable[[], int]:
+        def _save_page_images() -> int:
+            for page_number, highlight_file in pages_to_render:
+                pdf_reader.save_page_image(
+                    page_number,
+                    highlight_file,
+                    images_path / f"{page_number}.jpeg",
+                    export_options=export_options,
+                )
+            return len(pages_to_render)
+
+        return _save_page_images
+
+    return {
+        "get_page_image": time_benchmark(render_page_images, repeat),
+        "save_page_image": time_benchmark(save_page_images(ImageExportOptions()), repeat),
+        "save_clipped_page_image": time_benchmark(
+            save_page_images(ImageExportOptions(clip_padding=DEFAULT_CLIP_PADDING)), repeat
+        ),
+    }
+
+
+def _time_export(
+    local_fs: LocalFileReader, vault_path: Path, repeat: int
+) -> dict[str, BenchmarkResult]:
+    documents = [
+        Document(
+            get_document_highlights(local_fs, document_metadata, is_saving_images=False),
+            document_metadata,
+        )
+        for document_metadata in (
+            DocumentMetadata(metadata_file)
+            for metadata_file in local_fs.read_all_metadata_files(["visibleName"])
+        )
+    ]
+    export_runs = 0
+
+    def export_documents() -> int:
+        nonlocal export_runs
+        # each run exports to a new folder, so that no write is skipped as unchanged
+        export_runs += 1
+        run_vault_path = vault_path / str(export_runs)
+        run_vault_path.mkdir()
+        obsidian_document = ObsidianDocument(run_vault_path, run_vault_path)
+        for document in documents:
+            obsidian_document.extract_document(document)
+        return len(documents)
+
+    return {"export_documents": time_benchmark(export_documents, repeat)}
+
+
+def format_results(
+    results: dict[str, BenchmarkResult], previous_results: Optional[dict[str, dict]] = None
+) -> str:
+    lines = []
+    for name, result in results.items():
+        line = (
+            f"{name:>24}: {result.min_seconds * 1000:9.2f} ms min,"
+            f" {result.median_seconds * 1000:9.2f} ms median ({result.items} items)"
+        )
+        if previous_results and name in previous_results:
+            speedup = previous_results[name]["min_seconds"] / result.min_seconds
+            line += f", {speedup:.2f}x faster than the previous run"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--highlights", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rendered-pages", type=int, default=10)
+    parser.add_argument("--output", type=Path, help="JSON file where the results are saved")
+    parser.add_argument("--compare", type=Path, help="JSON results of a previous run")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        data_folder = Path(temporary_folder) / "xochitl"
+        vault_path = Path(temporary_folder) / "vault"
+        vault_path.mkdir()
+        document_ids = write_benchmark_library(data_folder, arguments)
+        results = run_benchmarks(
+            data_folder, document_ids, vault_path, arguments.repeat, arguments.rendered_pages
+        )
+
+    previous_results = None
+    if arguments.compare:
+        previous_results = json.loads(arguments.compare.read_text(encoding="utf-8"))["results"]
+    print(format_results(results, previous_results))
+    if arguments.output:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _get_git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                "documents": arguments.documents,
+                "pages": arguments.pages,
+                "highlights": arguments.highlights,
+                "repeat": arguments.repeat,
+                "rendered_pages": arguments.rendered_pages,
+            },
+            "results": {name: asdict(result) for name, result in results.items()},
+        }
+        arguments.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
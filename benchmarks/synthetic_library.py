@@ -0,0 +1,152 @@
+import argparse
+import json
+import random
+import uuid
+from pathlib import Path
+
+import fitz
+
+from highlights_extractor.process_documents import REMARKABLE_HEIGHT, REMARKABLE_WIDTH
+
+PAGES_PER_CHAPTER = 10
+
+
+def write_synthetic_library(
+    data_folder: Path,
+    documents: int,
+    pages_per_document: int,
+    highlights_per_page: int,
+    *,
+    seed: int = 0,
+    with_pdf: bool = True,
+) -> list[str]:
+    """Write the files of a synthetic xochitl library, shaped like the files synced from
+    a reMarkable: metadata, content and highlights files, and a PDF with a table of contents
+    of one chapter every `PAGES_PER_CHAPTER` pages.
+
+    Args:
+        data_folder: folder where the library is written
+        documents: number of documents
+        pages_per_document: number of pages of each document, all highlighted
+        highlights_per_page: number of highlights of each page
+        seed: seed of the random highlights. Defaults to 0.
+        with_pdf: whether the PDF of each document is written. Defaults to True.
+
+    Returns:
+        ids of the documents written
+    """
+    randomizer = random.Random(seed)
+    data_folder.mkdir(parents=True, exist_ok=True)
+    document_ids = []
+    for document_index in range(documents):
+        document_id = str(uuid.UUID(int=randomizer.getrandbits(128)))
+        page_ids = [
+            str(uuid.UUID(int=randomizer.getrandbits(128))) for _ in range(pages_per_document)
+        ]
+        _write_json(
+            data_folder / f"{document_id}.metadata",
+            {
+                "deleted": False,
+                "lastModified": "1667000000000",
+                "lastOpened": "1667000000000",
+                "lastOpenedPage": 0,
+                "metadatamodified": False,
+                "modified": False,
+                "parent": "",
+                "pinned": False,
+                "synced": True,
+                "type": "DocumentType",
+                "version": 3,
+                "visibleName": f"document_{document_index}",
+            },
+        )
+        _write_json(
+            data_folder / f"{document_id}.content",
+            {
+                "coverPageNumber": 0,
+                "documentMetadata": {},
+                "extraMetadata": {"LastTool": "Highlighter", "LastPen": "Ballpoint"},
+                "fileType": "pdf",
+                "fontName": "",
+                "lineHeight": -1,
+                "margins": 100,
+                "orientation": "portrait",
+                "pageCount": pages_per_document,
+                "pages": page_ids,
+                # the chapters of the table of contents start at page 1, as in fitz
+                "redirectionPageMap": list(range(1, pages_per_document + 1)),
+                "textAlignment": "left",
+                "textScale": 1,
+            },
+        )
+        highlights_folder = data_folder / f"{document_id}.highlights"
+        highlights_folder.mkdir(exist_ok=True)
+        for page_id in page_ids:
+            _write_json(
+                highlights_folder / f"{page_id}.json",
+                {"highlights": [_make_page_highlights(randomizer, highlights_per_page)]},
+            )
+        if with_pdf:
+            _write_pdf(data_folder / f"{document_id}.pdf", pages_per_document)
+        document_ids.append(document_id)
+    return document_ids
+
+
+def _make_page_highlights(randomizer: random.Random, highlights_per_page: int) -> list[dict]:
+    page_highlights = []
+    for _ in range(highlights_per_page):
+        text = " ".join(f"word{randomizer.randrange(10_000)}" for _ in range(12))
+        rects = [
+            {
+                "x": randomizer.uniform(0, REMARKABLE_WIDTH / 2),
+                "y": randomizer.uniform(0, REMARKABLE_HEIGHT - 40),
+                "width": randomizer.uniform(100, REMARKABLE_WIDTH / 2),
+                "height": 40.0,
+            }
+            for _ in range(randomizer.randint(1, 3))
+        ]
+        page_highlights.append(
+            {
+                "color": 1,
+                "length": len(text),
+                "rects": rects,
+                "start": randomizer.randrange(10_000),
+                "text": text,
+            }
+        )
+    return page_highlights
+
+
+def _write_pdf(path: Path, pages: int) -> None:
+    pdf = fitz.open()
+    for page_number in range(pages + 1):
+        pdf_page = pdf.new_page()
+        for line in range(20):
+            pdf_page.insert_text(
+                (50, 60 + line * 18), f"Page {page_number}, line {line}: " + "lorem ipsum " * 5
+            )
+    pdf.set_toc(
+        [
+            [1, f"Chapter {chapter}", chapter * PAGES_PER_CHAPTER + 1]
+            for chapter in range((pages + PAGES_PER_CHAPTER - 1) // PAGES_PER_CHAPTER)
+        ]
+    )
+    pdf.save(path)
+
+
+def _write_json(path: Path, content: dict) -> None:
+    path.write_text(json.dumps(content), encoding="utf-8")
+
+
+def write_benchmark_library(
+    data_folder: Path, arguments: argparse.Namespace, with_pdf: bool = True
+) -> list[str]:
+    """Write the synthetic library of the `--documents`, `--pages` and `--highlights`
+    arguments of a benchmark, see `write_synthetic_library`."""
+    return write_synthetic_library(
+        data_folder,
+        arguments.documents,
+        arguments.pages,
+        arguments.highlights,
+        with_pdf=with_pdf,
+    )
@@ -1,14 +1,76 @@
 # %%
+import io
+import json
+import os
 from pathlib import Path
 
 import streamlit as st
 
-from highlights_extractor.model_utils import get_document_highlights
-from highlights_extractor.models import Document, DocumentMetadata
+from highlights_extractor.constants import (
+    IMAGE_CACHE_FOLDER,
+    METADATA_CATALOG_PATH,
+    SYNC_MANIFEST_PATH,
+)
+from highlights_extractor.extraction_cache import ExtractionCache
+from highlights_extractor.instrumentation import PipelineTrace, trace_document
+from highlights_extractor.library_sync import SyncManifest, sync_library
+from highlights_extractor.model_utils import ExtractionResources
+from highlights_extractor.models import (
+    DEFAULT_CLIP_PADDING,
+    Document,
+    DocumentMetadata,
+    ImageExportOptions,
+    ImageFormat,
+    PageImage,
+)
+from highlights_extractor.pdf_document_pool import PDFDocumentPool
 from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.image_cache import PageImageCache
 from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
+from highlights_extractor.repository.metadata_catalog import MetadataCatalog
 
-local_fs = LocalFileReader()
+PREVIEW_IMAGES_MEMO_ENTRIES = 64
+
+
+@st.experimental_singleton
+def get_image_cache() -> PageImageCache:
+    return PageImageCache(IMAGE_CACHE_FOLDER)
+
+
+@st.experimental_singleton
+def get_metadata_catalog() -> MetadataCatalog:
+    return MetadataCatalog(METADATA_CATALOG_PATH)
+
+
+@st.experimental_singleton
+def get_document_pool() -> PDFDocumentPool:
+    return PDFDocumentPool()
+
+
+@st.experimental_singleton
+def get_process_extraction_cache() -> ExtractionCache:
+    return ExtractionCache()
+
+
+@st.experimental_memo(max_entries=PREVIEW_IMAGES_MEMO_ENTRIES)
+def render_page_preview(
+    document_id: str, page_number: int, files_mtimes: tuple[int, ...], _page_image: PageImage
+) -> bytes:
+    """Render a page image once for a version of the files of its document, the reruns
+    show it from the memo. The page image itself is not part of the memo key.
+    """
+    # the other arguments are only the memo key
+    # pylint: disable=unused-argument
+    image_file = io.BytesIO()
+    _page_image.render().save(image_file, format="JPEG")
+    return image_file.getvalue()
+
+
+if "extraction_cache" not in st.session_state:
+    st.session_state["extraction_cache"] = ExtractionCache(parent=get_process_extraction_cache())
+extraction_cache: ExtractionCache = st.session_state["extraction_cache"]
+
+local_fs = LocalFileReader(metadata_catalog=get_metadata_catalog())
 metadata_files = local_fs.read_all_metadata_files(["visibleName"])
 documents_metadata = [DocumentMetadata(metadata_file) for metadata_file in metadata_files]
 
@@ -42,26 +104,109 @@ with st.sidebar:
         )
     )
     is_saving_images = st.checkbox("Load and export page images?")
+    render_processes = int(
+        st.number_input(
+            "Image rendering processes",
+            min_value=1,
+            max_value=os.cpu_count() or 1,
+            value=1,
+            disabled=not is_saving_images,
+        )
+    )
+    image_format = st.selectbox(
+        "Image format",
+        list(ImageFormat),
+        format_func=lambda image_format: image_format.name,
+        disabled=not is_saving_images,
+    )
+    image_quality = st.slider(
+        "Image quality", min_value=1, max_value=100, value=75, disabled=not is_saving_images
+    )
+    is_clipping_images = st.checkbox(
+        "Render only the highlighted area of the pages?", disabled=not is_saving_images
+    )
+    clip_padding = st.number_input(
+        "Padding around the highlighted area",
+        min_value=0.0,
+        value=DEFAULT_CLIP_PADDING,
+        disabled=not is_saving_images or not is_clipping_images,
+    )
     extractor = ObsidianDocument(
         vault_path=destination_path,
         image_path=images_destination_path,
         is_saving_images=is_saving_images,
+        render_processes=render_processes,
+        image_export_options=ImageExportOptions(
+            image_format, image_quality, clip_padding if is_clipping_images else None
+        ),
     )
+    st.markdown("---")
+    if st.button("Sync library"):
+        sync_report = sync_library(
+            local_fs,
+            extractor,
+            SyncManifest(SYNC_MANIFEST_PATH),
+            ExtractionResources(get_image_cache(), get_document_pool()),
+        )
+        st.caption(
+            f"{len(sync_report.added)} added, {len(sync_report.updated)} updated,"
+            f" {len(sync_report.unchanged)} unchanged, {len(sync_report.deleted)} deleted,"
+            f" {len(sync_report.failed)} failed"
+        )
+        st.caption(
+            f"{extractor.file_writer.stats.written} files written,"
+            f" {extractor.file_writer.stats.skipped} unchanged files skipped"
+        )
 
 if document_metadata:
     st.header(document_metadata.document_name)
     extracting_document = st.button("Extract Document")
 
-    document_highlights = get_document_highlights(local_fs, document_metadata, is_saving_images)
+    trace = PipelineTrace()
+    with trace_document(trace, document_metadata.document_id):
+        document_highlights = extraction_cache.get_document_highlights(
+            local_fs,
+            document_metadata,
+            is_saving_images,
+            ExtractionResources(get_image_cache(), get_document_pool()),
+        )
 
-    for chapter_highlights in document_highlights:
-        st.header(chapter_highlights.chapter)
-        for page in chapter_highlights:
-            if page.image:
-                st.image(page.image)
-            for highlight in page.highlights:
-                st.caption(highlight)
+        document_files_mtimes = local_fs.get_document_files_mtimes(document_metadata.document_id)
+        for chapter_highlights in document_highlights:
+            st.header(chapter_highlights.chapter)
+            for page in chapter_highlights:
+                if page.image:
+                    st.image(
+                        render_page_preview(
+                            document_metadata.document_id,
+                            page.image.page_number,
+                            document_files_mtimes,
+                            page.image,
+                        )
+                    )
+                for highlight in page.highlights:
+                    st.caption(highlight)
 
-    final_document = Document(document_highlights, document_metadata)
+        final_document = Document(document_highlights, document_metadata)
+        if extracting_document:
+            extractor.extract_document(final_document)
     if extracting_document:
-        extractor.extract_document(final_document)
+        image_cache_stats = get_image_cache().stats
+        st.caption(
+            f"Image cache: {image_cache_stats.hits} hits, {image_cache_stats.misses} misses"
+        )
+        document_pool_stats = get_document_pool().stats
+        st.caption(
+            f"PDF documents: {document_pool_stats.hits} reused,"
+            f" {document_pool_stats.misses} opened"
+        )
+        st.caption(
+            f"{extractor.file_writer.stats.written} files written,"
+            f" {extractor.file_writer.stats.skipped} unchanged files skipped"
+        )
+
+    with st.sidebar.expander("Extraction stages"):
+        st.text(trace.format_total_stages() or "Extraction served from the cache")
+        st.download_button(
+            "Download the trace", json.dumps(trace.to_dict(), indent=2), "trace.json"
+        )
@@ -0,0 +1,425 @@
+import argparse
+import cProfile
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Collection, Optional
+
+from highlights_extractor.config.exceptions import DocumentNotProcessableError
+from highlights_extractor.constants import (
+    DATA_FOLDER,
+    IMAGE_CACHE_FOLDER,
+    SYNC_MANIFEST_PATH,
+)
+from highlights_extractor.instrumentation import PipelineTrace
+from highlights_extractor.library_sync import SyncManifest, sync_library
+from highlights_extractor.library_watcher import (
+    DEFAULT_DEBOUNCE_SECONDS,
+    DEFAULT_MAX_WAIT_SECONDS,
+    DEFAULT_POLL_INTERVAL_SECONDS,
+    LibraryWatcher,
+    WatchOptions,
+    watch_library,
+)
+from highlights_extractor.model_utils import ExtractionResources, extract_document
+from highlights_extractor.models import (
+    DEFAULT_CLIP_PADDING,
+    DocumentMetadata,
+    ImageExportOptions,
+    ImageFormat,
+)
+from highlights_extractor.pdf_document_pool import PDFDocumentPool
+from highlights_extractor.repository.archive_file_reader import ArchiveFileReader
+from highlights_extractor.repository.file_reader import (
+    FileReader,
+    LocalFileReader,
+    RawFile,
+)
+from highlights_extractor.repository.file_writer import WriteStats
+from highlights_extractor.repository.image_cache import PageImageCache
+from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
+
+DEFAULT_DOCUMENT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@dataclass
+class DocumentExportResult:
+    document_id: str
+    document_name: str
+    exported_pages: int
+    elapsed_seconds: float
+    error: Optional[str] = None
+
+
+def export_document(
+    local_fs: FileReader,
+    document_metadata: DocumentMetadata,
+    obsidian_document: ObsidianDocument,
+    resources: ExtractionResources = ExtractionResources(),
+) -> DocumentExportResult:
+    start_time = time.perf_counter()
+    try:
+        document = extract_document(local_fs, document_metadata, obsidian_document, resources)
+    except DocumentNotProcessableError as error:
+        return _failed_export_result(document_metadata, start_time, str(error))
+    except Exception as error:  # pylint: disable=broad-except
+        # a broken file of a document must not stop the export of the others
+        return _failed_export_result(document_metadata, start_time, _format_error(error))
+    exported_pages = sum(
+        len(chapter_highlights.page_highlights) for chapter_highlights in document
+    )
+    return DocumentExportResult(
+        document_metadata.document_id,
+        document_metadata.document_name,
+        exported_pages,
+        time.perf_counter() - start_time,
+    )
+
+
+def _format_error(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+def _failed_export_result(
+    document_metadata: DocumentMetadata, start_time: float, error: str
+) -> DocumentExportResult:
+    return DocumentExportResult(
+        document_metadata.document_id,
+        document_metadata.document_name,
+        0,
+        time.perf_counter() - start_time,
+        error,
+    )
+
+
+def export_library(
+    local_fs: FileReader,
+    obsidian_document: ObsidianDocument,
+    document_workers: int = DEFAULT_DOCUMENT_WORKERS,
+    resources: ExtractionResources = ExtractionResources(),
+    *,
+    on_progress: Optional[Callable[[int, int, DocumentExportResult], None]] = None,
+    document_ids: Optional[Collection[str]] = None,
+) -> list[DocumentExportResult]:
+    """Export every PDF document of the library, with several documents exported at
+    the same time. Documents that fail to export are skipped and recorded.
+
+    Args:
+        local_fs: reader of the library
+        obsidian_document: exporter of the documents
+        document_workers: number of documents exported at the same time
+        resources: image cache, pool of the open PDF documents and trace where the stages of
+            each export are recorded. Defaults to none of them.
+        on_progress: called with the number of finished documents, the number of documents
+            and the result of the last finished document. Defaults to None.
+        document_ids: ids of the documents to export, only their metadata files are read.
+            Defaults to None, which exports every document of the library.
+
+    Returns:
+        result of the export of each document, in the order they finished
+    """
+    if document_ids is None:
+        metadata_files = local_fs.read_all_metadata_files(["visibleName"])
+        results: list[DocumentExportResult] = []
+    else:
+        metadata_files, results = _read_documents_metadata_files(local_fs, document_ids)
+    documents_metadata = [
+        DocumentMetadata(metadata_file)
+        for metadata_file in metadata_files
+        if local_fs.has_document_pdf(metadata_file.document_id)
+    ]
+    documents_count = len(results) + len(documents_metadata)
+    with ThreadPoolExecutor(max_workers=max(document_workers, 1)) as executor:
+        futures = [
+            executor.submit(
+                export_document, local_fs, document_metadata, obsidian_document, resources
+            )
+            for document_metadata in documents_metadata
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if on_progress:
+                on_progress(len(results), documents_count, results[-1])
+    return results
+
+
+def _read_documents_metadata_files(
+    local_fs: FileReader, document_ids: Collection[str]
+) -> tuple[list[RawFile], list[DocumentExportResult]]:
+    metadata_files = []
+    failed_results = []
+    for document_id in document_ids:
+        try:
+            metadata_files.append(local_fs.read_document_metadata(document_id, ["visibleName"]))
+        except Exception as error:  # pylint: disable=broad-except
+            # a metadata file being written by the tablet can be incomplete
+            failed_results.append(
+                DocumentExportResult(document_id, document_id, 0, 0.0, _format_error(error))
+            )
+    return metadata_files, failed_results
+
+
+def format_summary(
+    results: list[DocumentExportResult],
+    elapsed_seconds: float,
+    write_stats: Optional[WriteStats] = None,
+    trace: Optional[PipelineTrace] = None,
+) -> str:
+    elapsed_seconds = max(elapsed_seconds, 1e-9)
+    failed_results = [result for result in results if result.error]
+    exported_pages = sum(result.exported_pages for result in results)
+    summary_lines = [
+        (
+            f"Exported {len(results) - len(failed_results)} documents and {exported_pages} pages"
+            f" in {elapsed_seconds:.2f}s"
+            f" ({len(results) / elapsed_seconds:.2f} documents/s,"
+            f" {exported_pages / elapsed_seconds:.2f} pages/s)"
+        ),
+    ]
+    if write_stats:
+        summary_lines.append(_format_write_stats(write_stats))
+    if trace:
+        summary_lines.extend(["Stages:", trace.format_total_stages()])
+    if failed_results:
+        summary_lines.append(f"Skipped {len(failed_results)} documents that failed to export:")
+        summary_lines.extend(
+            f"  - {result.document_name} ({result.document_id}): {result.error}"
+            for result in failed_results
+        )
+    return "\n".join(summary_lines)
+
+
+def _format_write_stats(write_stats: WriteStats) -> str:
+    return f"Wrote {write_stats.written} files, skipped {write_stats.skipped} unchanged files"
+
+
+def _print_progress(finished: int, total: int, result: DocumentExportResult) -> None:
+    status = f"skipped: {result.error}" if result.error else f"{result.exported_pages} pages"
+    print(
+        f"[{finished}/{total}] {result.document_name} ({status}, {result.elapsed_seconds:.2f}s)",
+        file=sys.stderr,
+    )
+
+
+def parse_arguments(arguments: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Export the highlights of all the documents of a reMarkable library."
+    )
+    parser.add_argument("vault_path", type=Path, help="folder where the notes are written")
+    parser.add_argument(
+        "--data-folder",
+        type=Path,
+        default=DATA_FOLDER,
+        help="xochitl folder, or a zip or tar archive of it read without being extracted",
+    )
+    parser.add_argument(
+        "--images-path", type=Path, help="folder of the page images, the vault by default"
+    )
+    parser.add_argument("--images", action="store_true", help="export the page images")
+    parser.add_argument(
+        "--image-format", choices=[image_format.value for image_format in ImageFormat]
+    )
+    parser.add_argument("--image-quality", type=int, default=ImageExportOptions.quality)
+    parser.add_argument(
+        "--clip-padding",
+        type=float,
+        nargs="?",
+        const=DEFAULT_CLIP_PADDING,
+        help=(
+            "render only the highlighted area of the pages, with this padding in PDF points"
+            f" around it, {DEFAULT_CLIP_PADDING:g} when not given"
+        ),
+    )
+    parser.add_argument("--no-image-cache", action="store_true")
+    parser.add_argument("--workers", type=int, default=DEFAULT_DOCUMENT_WORKERS)
+    parser.add_argument("--render-processes", type=int, default=1)
+    parser.add_argument(
+        "--incremental", action="store_true", help="export only the changed documents"
+    )
+    parser.add_argument("--manifest", type=Path, default=SYNC_MANIFEST_PATH)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after the export, keep exporting the documents whose files change",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL_SECONDS,
+        help="seconds between two scans of the data folder in watch mode",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help="seconds without any file change before the changed documents are exported",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=DEFAULT_MAX_WAIT_SECONDS,
+        help="most seconds the changed documents wait while files keep changing",
+    )
+    parser.add_argument(
+        "--trace", type=Path, help="JSON file where the time of each stage is saved"
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        help=(
+            "file where the cProfile stats of the main thread are dumped,"
+            " use it with --workers 1 to profile the whole export"
+        ),
+    )
+    parsed_arguments = parser.parse_args(arguments)
+    if parsed_arguments.incremental and parsed_arguments.data_folder.is_file():
+        parser.error("--incremental needs an extracted xochitl folder, not an archive")
+    if parsed_arguments.watch and parsed_arguments.data_folder.is_file():
+        parser.error("--watch needs an extracted xochitl folder, not an archive")
+    return parsed_arguments
+
+
+def main(arguments: Optional[list[str]] = None) -> int:
+    parsed_arguments = parse_arguments(arguments)
+    trace = PipelineTrace() if parsed_arguments.trace else None
+    profiler = cProfile.Profile() if parsed_arguments.profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        exit_code = _export(parsed_arguments, trace)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(parsed_arguments.profile)
+    if trace:
+        trace.save(parsed_arguments.trace)
+    return exit_code
+
+
+def _export(parsed_arguments: argparse.Namespace, trace: Optional[PipelineTrace]) -> int:
+    image_format = (
+        ImageFormat(parsed_arguments.image_format)
+        if parsed_arguments.image_format
+        else ImageExportOptions.image_format
+    )
+    obsidian_document = ObsidianDocument(
+        vault_path=parsed_arguments.vault_path,
+        image_path=parsed_arguments.images_path or parsed_arguments.vault_path,
+        is_saving_images=parsed_arguments.images,
+        render_processes=parsed_arguments.render_processes,
+        image_export_options=ImageExportOptions(
+            image_format, parsed_arguments.image_quality, parsed_arguments.clip_padding
+        ),
+    )
+    resources = ExtractionResources(
+        None if parsed_arguments.no_image_cache else PageImageCache(IMAGE_CACHE_FOLDER),
+        PDFDocumentPool(max_documents=max(parsed_arguments.workers, 1)),
+        trace,
+    )
+    # the folder is scanned before the export, so the files changed meanwhile are exported again
+    watcher = (
+        LibraryWatcher(
+            parsed_arguments.data_folder,
+            WatchOptions(parsed_arguments.debounce, parsed_arguments.max_wait),
+        )
+        if parsed_arguments.watch
+        else None
+    )
+
+    start_time = time.perf_counter()
+    if parsed_arguments.incremental:
+        sync_report = sync_library(
+            LocalFileReader(parsed_arguments.data_folder),
+            obsidian_document,
+            SyncManifest(parsed_arguments.manifest),
+            resources,
+        )
+        print(
+            f"Synced in {time.perf_counter() - start_time:.2f}s:"
+            f" {len(sync_report.added)} added, {len(sync_report.updated)} updated,"
+            f" {len(sync_report.unchanged)} unchanged, {len(sync_report.deleted)} deleted,"
+            f" {len(sync_report.failed)} skipped"
+        )
+        print(_format_write_stats(obsidian_document.file_writer.stats))
+        if trace:
+            print("Stages:", trace.format_total_stages(), sep="\n")
+    else:
+        local_fs: FileReader = (
+            ArchiveFileReader(parsed_arguments.data_folder)
+            if parsed_arguments.data_folder.is_file()
+            else LocalFileReader(parsed_arguments.data_folder)
+        )
+        with local_fs:
+            results = export_library(
+                local_fs,
+                obsidian_document,
+                parsed_arguments.workers,
+                resources,
+                on_progress=_print_progress,
+            )
+        print(
+            format_summary(
+                results,
+                time.perf_counter() - start_time,
+                obsidian_document.file_writer.stats,
+                trace,
+            )
+        )
+
+    if watcher:
+        _watch(parsed_arguments, watcher, obsidian_document, resources)
+    return 0
+
+
+def _watch(
+    parsed_arguments: argparse.Namespace,
+    watcher: LibraryWatcher,
+    obsidian_document: ObsidianDocument,
+    resources: ExtractionResources,
+) -> None:
+    local_fs = LocalFileReader(parsed_arguments.data_folder)
+
+    def export_changed_documents(changed_document_ids: set[str]) -> None:
+        start_time = time.perf_counter()
+        # the documents removed from the library have no metadata file anymore
+        document_ids = [
+            document_id
+            for document_id in changed_document_ids
+            if (local_fs.data_folder / f"{document_id}.metadata").exists()
+        ]
+        print(f"{len(changed_document_ids)} documents changed", file=sys.stderr)
+        results = export_library(
+            local_fs,
+            obsidian_document,
+            parsed_arguments.workers,
+            resources,
+            on_progress=_print_progress,
+            document_ids=document_ids,
+        )
+        print(format_summary(results, time.perf_counter() - start_time))
+        # a document read while the tablet syncs can be incomplete, it is exported again
+        # once its files settle
+        given_up_document_ids = watcher.retry(
+            result.document_id for result in results if result.error
+        )
+        if given_up_document_ids:
+            print(
+                (
+                    f"{len(given_up_document_ids)} documents are exported again once their files"
+                    " change"
+                ),
+                file=sys.stderr,
+            )
+
+    print(f"Watching {local_fs.data_folder}, press Ctrl+C to stop", file=sys.stderr)
+    try:
+        watch_library(watcher, export_changed_documents, parsed_arguments.poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,6 @@
 class DocumentNotProcessableError(ValueError):
     """Error to be raised when the document is not processable."""
+
+
+class PageNotFoundError(DocumentNotProcessableError):
+    """Error to be raised when a page cannot be found in the content of its document."""
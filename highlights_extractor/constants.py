@@ -2,3 +2,6 @@ from pathlib import Path
 
 ROOT_FOLDER = Path(__file__).parent.parent
 DATA_FOLDER = ROOT_FOLDER / "data/xochitl"
+IMAGE_CACHE_FOLDER = ROOT_FOLDER / ".cache/page_images"
+SYNC_MANIFEST_PATH = ROOT_FOLDER / ".cache/sync_manifest.json"
+METADATA_CATALOG_PATH = ROOT_FOLDER / ".cache/metadata_catalog.sqlite3"
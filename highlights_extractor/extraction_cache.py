@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from highlights_extractor.model_utils import (
+    ExtractionResources,
+    get_document_highlights,
+)
+from highlights_extractor.models import DocumentHighlights, DocumentMetadata
+from highlights_extractor.repository.file_reader import FileReader
+from highlights_extractor.repository.image_cache import CacheStats
+
+DEFAULT_CACHED_DOCUMENTS = 8
+
+
+class ExtractionCache:
+    """Least recently used cache of extracted documents, to extract a document again only
+    when one of its files changed.
+    A cache can fall back on a parent cache, for example a cache per Streamlit session in
+    front of a cache shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        max_documents: int = DEFAULT_CACHED_DOCUMENTS,
+        parent: Optional["ExtractionCache"] = None,
+    ) -> None:
+        self.max_documents = max_documents
+        self.parent = parent
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._documents_highlights: "OrderedDict[tuple, DocumentHighlights]" = OrderedDict()
+
+    def get_document_highlights(
+        self,
+        local_fs: FileReader,
+        document_metadata: DocumentMetadata,
+        is_saving_images: bool,
+        resources: ExtractionResources = ExtractionResources(),
+    ) -> DocumentHighlights:
+        """Get the highlights of a document, see `model_utils.get_document_highlights`.
+        The document is only extracted when it is not in the cache with the same
+        `is_saving_images` flag and the same modification times of its files.
+        """
+        cache_key = (
+            document_metadata.document_id,
+            is_saving_images,
+            local_fs.get_document_files_mtimes(document_metadata.document_id),
+        )
+        with self._lock:
+            if cache_key in self._documents_highlights:
+                self.stats.hits += 1
+                self._documents_highlights.move_to_end(cache_key)
+                return self._documents_highlights[cache_key]
+            self.stats.misses += 1
+
+        if self.parent:
+            document_highlights = self.parent.get_document_highlights(
+                local_fs, document_metadata, is_saving_images, resources
+            )
+        else:
+            document_highlights = get_document_highlights(
+                local_fs, document_metadata, is_saving_images, resources
+            )
+
+        with self._lock:
+            self._documents_highlights[cache_key] = document_highlights
+            while len(self._documents_highlights) > self.max_documents:
+                self._documents_highlights.popitem(last=False)
+                self.stats.evictions += 1
+        return document_highlights
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents_highlights.clear()
@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    calls: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+    def add(self, other: "StageStats") -> None:
+        self.seconds += other.seconds
+        self.calls += other.calls
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+
+
+class PipelineTrace:
+    """Wall time, number of calls and bytes read and written of each stage of the extraction
+    of each document. Stages run in several threads at the same time add up their times,
+    so the time of a stage can be longer than the extraction of its document.
+    """
+
+    def __init__(self) -> None:
+        self.documents_stages: dict[str, dict[str, StageStats]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, document_id: str, stage_name: str, stage_stats: StageStats) -> None:
+        with self._lock:
+            stages = self.documents_stages.setdefault(document_id, {})
+            stages.setdefault(stage_name, StageStats()).add(stage_stats)
+
+    def get_total_stages(self) -> dict[str, StageStats]:
+        total_stages: dict[str, StageStats] = {}
+        with self._lock:
+            for stages in self.documents_stages.values():
+                for stage_name, stage_stats in stages.items():
+                    total_stages.setdefault(stage_name, StageStats()).add(stage_stats)
+        return total_stages
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            documents = {
+                document_id: {
+                    stage_name: asdict(stage_stats) for stage_name, stage_stats in stages.items()
+                }
+                for document_id, stages in self.documents_stages.items()
+            }
+        return {
+            "documents": documents,
+            "total": {
+                stage_name: asdict(stage_stats)
+                for stage_name, stage_stats in self.get_total_stages().items()
+            },
+        }
+
+    def save(self, trace_path: Path) -> None:
+        trace_path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    def format_total_stages(self) -> str:
+        return "\n".join(
+            f"  - {stage_name}: {stage_stats.seconds:.3f}s, {stage_stats.calls} calls"
+            + (f", {stage_stats.bytes_read} bytes read" if stage_stats.bytes_read else "")
+            + (f", {stage_stats.bytes_written} bytes written" if stage_stats.bytes_written else "")
+            for stage_name, stage_stats in sorted(self.get_total_stages().items())
+        )
+
+
+_current_document: ContextVar[Optional[tuple[PipelineTrace, str]]] = ContextVar(
+    "_current_document", default=None
+)
+
+
+@contextmanager
+def trace_document(trace: Optional[PipelineTrace], document_id: str) -> Iterator[None]:
+    """Record the stages run in this context, and in the threads started with a copy of it,
+    as stages of the document in `trace`. Nothing is recorded when `trace` is None."""
+    if trace is None:
+        yield
+        return
+    token = _current_document.set((trace, document_id))
+    try:
+        yield
+    finally:
+        _current_document.reset(token)
+
+
+@contextmanager
+def stage(stage_name: str) -> Iterator[None]:
+    """Time a stage of the extraction of the document traced in the current context."""
+    current_document = _current_document.get()
+    if current_document is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace, document_id = current_document
+        trace.record(document_id, stage_name, StageStats(time.perf_counter() - start_time, 1))
+
+
+def is_tracing() -> bool:
+    return _current_document.get() is not None
+
+
+def record_bytes(stage_name: str, bytes_read: int = 0, bytes_written: int = 0) -> None:
+    current_document = _current_document.get()
+    if current_document is None:
+        return
+    trace, document_id = current_document
+    trace.record(
+        document_id,
+        stage_name,
+        StageStats(bytes_read=bytes_read, bytes_written=bytes_written),
+    )
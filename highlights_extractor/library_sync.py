@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from highlights_extractor.config.exceptions import DocumentNotProcessableError
+from highlights_extractor.model_utils import ExtractionResources, extract_document
+from highlights_extractor.models import DocumentMetadata
+from highlights_extractor.path_utils import extract_page_id_from_path
+from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
+
+MANIFEST_VERSION = 1
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FileFingerprint:
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    @classmethod
+    def from_path(
+        cls, path: Path, previous: Optional["FileFingerprint"] = None
+    ) -> "FileFingerprint":
+        """Fingerprint a file. The file is only hashed when its size or modification time
+        changed since the previous fingerprint.
+        """
+        file_stat = path.stat()
+        if (
+            previous
+            and previous.size == file_stat.st_size
+            and previous.mtime_ns == file_stat.st_mtime_ns
+        ):
+            return previous
+        return cls(file_stat.st_size, file_stat.st_mtime_ns, _hash_file(path))
+
+    def has_same_content(self, other: Optional["FileFingerprint"]) -> bool:
+        return other is not None and self.sha256 == other.sha256
+
+
+@dataclass
+class DocumentFingerprint:
+    content: FileFingerprint
+    pdf: FileFingerprint
+    pages: dict[str, FileFingerprint]
+
+    @classmethod
+    def from_dict(cls, fingerprint: dict) -> "DocumentFingerprint":
+        return cls(
+            content=FileFingerprint(**fingerprint["content"]),
+            pdf=FileFingerprint(**fingerprint["pdf"]),
+            pages={
+                page_id: FileFingerprint(**page_fingerprint)
+                for page_id, page_fingerprint in fingerprint["pages"].items()
+            },
+        )
+
+
+@dataclass
+class DocumentManifestEntry:
+    document_name: str
+    fingerprint: DocumentFingerprint
+    exported_files: list[str]
+    # hash of the export settings of the document, see `fingerprint_export_settings`
+    export_settings: str = ""
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "DocumentManifestEntry":
+        return cls(
+            document_name=entry["document_name"],
+            fingerprint=DocumentFingerprint.from_dict(entry["fingerprint"]),
+            exported_files=entry["exported_files"],
+            export_settings=entry.get("export_settings", ""),
+        )
+
+
+@dataclass
+class SyncReport:
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+class SyncManifest:
+    """Manifest of the documents already exported, with the fingerprints of their files
+    at the time of the export and the files written for them.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, manifest_path: Path) -> None:
+        self.manifest_path = manifest_path
+        self.documents = self._load()
+
+    def _load(self) -> dict[str, DocumentManifestEntry]:
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path, "rb") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return {
+            document_id: DocumentManifestEntry.from_dict(entry)
+            for document_id, entry in manifest["documents"].items()
+        }
+
+    def save(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "documents": {
+                document_id: asdict(entry) for document_id, entry in self.documents.items()
+            },
+        }
+        temporary_manifest_path = self.manifest_path.with_suffix(".tmp")
+        with open(temporary_manifest_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temporary_manifest_path, self.manifest_path)
+
+
+def fingerprint_document(
+    data_folder: Path, document_id: str, previous_entry: Optional[DocumentManifestEntry] = None
+) -> DocumentFingerprint:
+    previous_fingerprint = previous_entry.fingerprint if previous_entry else None
+    highlights_folder = data_folder / f"{document_id}.highlights"
+    pages: dict[str, FileFingerprint] = {}
+    if highlights_folder.is_dir():
+        for highlight_file in os.scandir(highlights_folder):
+            if not highlight_file.name.endswith(".json"):
+                continue
+            page_id = extract_page_id_from_path(Path(highlight_file.path))
+            pages[page_id] = FileFingerprint.from_path(
+                Path(highlight_file.path),
+                previous_fingerprint.pages.get(page_id) if previous_fingerprint else None,
+            )
+    return DocumentFingerprint(
+        content=FileFingerprint.from_path(
+            data_folder / f"{document_id}.content",
+            previous_fingerprint.content if previous_fingerprint else None,
+        ),
+        pdf=FileFingerprint.from_path(
+            data_folder / f"{document_id}.pdf",
+            previous_fingerprint.pdf if previous_fingerprint else None,
+        ),
+        pages=pages,
+    )
+
+
+def fingerprint_export_settings(obsidian_document: ObsidianDocument) -> str:
+    export_settings = json.dumps(obsidian_document.get_export_settings(), sort_keys=True)
+    return hashlib.sha256(export_settings.encode()).hexdigest()
+
+
+def get_pages_to_export(
+    document_name: str,
+    fingerprint: DocumentFingerprint,
+    previous_entry: Optional[DocumentManifestEntry],
+    export_settings: str = "",
+) -> Optional[set[str]]:
+    """Compare the fingerprint of a document with the one of its previous export.
+    When the document is new, renamed, exported with other settings, or when its content
+    or PDF file changed, all its pages are exported again. Otherwise only the pages whose
+    highlights are new or changed.
+
+    Args:
+        document_name: current name of the document
+        fingerprint: current fingerprint of the document
+        previous_entry: manifest entry of the previous export of the document, if any
+        export_settings: fingerprint of the current export settings. Defaults to "".
+
+    Returns:
+        None if the document did not change, else the ids of the pages to export again.
+        The set is empty when only removed pages changed the document.
+    """
+    if (
+        previous_entry is None
+        or previous_entry.document_name != document_name
+        or previous_entry.export_settings != export_settings
+        or not fingerprint.content.has_same_content(previous_entry.fingerprint.content)
+        or not fingerprint.pdf.has_same_content(previous_entry.fingerprint.pdf)
+    ):
+        return set(fingerprint.pages)
+
+    previous_pages = previous_entry.fingerprint.pages
+    changed_page_ids = {
+        page_id
+        for page_id, page_fingerprint in fingerprint.pages.items()
+        if not page_fingerprint.has_same_content(previous_pages.get(page_id))
+    }
+    if not changed_page_ids and previous_pages.keys() == fingerprint.pages.keys():
+        return None
+    return changed_page_ids
+
+
+def sync_library(
+    local_fs: LocalFileReader,
+    obsidian_document: ObsidianDocument,
+    manifest: SyncManifest,
+    resources: ExtractionResources = ExtractionResources(),
+) -> SyncReport:
+    """Export only the documents of the library that changed since the previous sync,
+    and remove the exported files of the documents deleted from the library.
+
+    Args:
+        local_fs: reader of the library
+        obsidian_document: exporter of the documents
+        manifest: manifest of the previous sync, updated and saved by the sync
+        resources: image cache, pool of the open PDF documents and trace where the stages of
+            each export are recorded. Defaults to none of them.
+
+    Returns:
+        ids of the added, updated, unchanged, deleted and failed documents
+    """
+    report = SyncReport()
+    library_document_ids = set()
+    try:
+        for metadata_file in local_fs.read_all_metadata_files(["visibleName"]):
+            document_metadata = DocumentMetadata(metadata_file)
+            document_id = document_metadata.document_id
+            if not local_fs.has_document_pdf(document_id):
+                continue
+            library_document_ids.add(document_id)
+
+            previous_entry = manifest.documents.get(document_id)
+            try:
+                entry = _sync_document(
+                    local_fs,
+                    document_metadata,
+                    obsidian_document,
+                    previous_entry,
+                    resources,
+                )
+            except DocumentNotProcessableError as error:
+                report.failed[document_id] = str(error)
+                continue
+            except Exception as error:  # pylint: disable=broad-except
+                # a broken file of a document must not stop the sync of the others
+                report.failed[document_id] = f"{type(error).__name__}: {error}"
+                continue
+            if entry is None:
+                report.unchanged.append(document_id)
+                continue
+            if previous_entry:
+                report.updated.append(document_id)
+            else:
+                report.added.append(document_id)
+            manifest.documents[document_id] = entry
+
+        for document_id in set(manifest.documents) - library_document_ids:
+            _remove_files(manifest.documents.pop(document_id).exported_files)
+            report.deleted.append(document_id)
+    finally:
+        # the documents synced before an error are not exported again by the next sync
+        manifest.save()
+    return report
+
+
+def _sync_document(
+    local_fs: LocalFileReader,
+    document_metadata: DocumentMetadata,
+    obsidian_document: ObsidianDocument,
+    previous_entry: Optional[DocumentManifestEntry],
+    resources: ExtractionResources,
+) -> Optional[DocumentManifestEntry]:
+    """Export the changed pages of a document.
+
+    Returns:
+        manifest entry of the exported document, None when it did not change
+    """
+    document_id = document_metadata.document_id
+    export_settings = fingerprint_export_settings(obsidian_document)
+    fingerprint = fingerprint_document(local_fs.data_folder, document_id, previous_entry)
+    page_ids_to_export = get_pages_to_export(
+        document_metadata.document_name, fingerprint, previous_entry, export_settings
+    )
+    if page_ids_to_export is None:
+        return None
+
+    document = extract_document(
+        local_fs, document_metadata, obsidian_document, resources, page_ids_to_export
+    )
+
+    exported_files = [str(path) for path in obsidian_document.get_exported_paths(document)]
+    if previous_entry:
+        # the files exported before in another vault or image folder are left untouched
+        _remove_files(
+            file_path
+            for file_path in set(previous_entry.exported_files) - set(exported_files)
+            if Path(file_path).parent
+            in (obsidian_document.vault_path, obsidian_document.image_path)
+        )
+    return DocumentManifestEntry(
+        document_metadata.document_name, fingerprint, exported_files, export_settings
+    )
+
+
+def _remove_files(file_paths: Iterable[str]) -> None:
+    for file_path in file_paths:
+        Path(file_path).unlink(missing_ok=True)
+
+
+def _hash_file(path: Path) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
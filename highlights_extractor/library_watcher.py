@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from highlights_extractor.path_utils import extract_document_id_from_path
+
+DEFAULT_POLL_INTERVAL_SECONDS = 2.0
+DEFAULT_DEBOUNCE_SECONDS = 5.0
+DEFAULT_MAX_WAIT_SECONDS = 60.0
+DEFAULT_MAX_RETRIES = 3
+
+
+def scan_library_files(data_folder: Path) -> dict[str, tuple[int, int]]:
+    """Get the modification time and size of the files of a xochitl folder, and of the page
+    files of its highlights folders, by their path relative to the folder. The other
+    folders of the library are not scanned, as they are not exported."""
+    files_stat: dict[str, tuple[int, int]] = {}
+    with os.scandir(data_folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    entry_stat = entry.stat()
+                    files_stat[entry.name] = (entry_stat.st_mtime_ns, entry_stat.st_size)
+                elif entry.name.endswith(".highlights") and entry.is_dir():
+                    files_stat.update(_scan_highlights_folder(entry))
+            except FileNotFoundError:
+                # removed while scanned, it is seen as removed by the next scan
+                continue
+    return files_stat
+
+
+def _scan_highlights_folder(highlights_folder: os.DirEntry) -> dict[str, tuple[int, int]]:
+    files_stat = {}
+    with os.scandir(highlights_folder.path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                entry_stat = entry.stat()
+                files_stat[f"{highlights_folder.name}/{entry.name}"] = (
+                    entry_stat.st_mtime_ns,
+                    entry_stat.st_size,
+                )
+    return files_stat
+
+
+def get_changed_files(
+    previous_files_stat: dict[str, tuple[int, int]], files_stat: dict[str, tuple[int, int]]
+) -> set[str]:
+    """Get the files added, modified or removed between two scans."""
+    return {
+        file_name
+        for file_name in previous_files_stat.keys() | files_stat.keys()
+        if previous_files_stat.get(file_name) != files_stat.get(file_name)
+    }
+
+
+def get_changed_document_ids(changed_files: Iterable[str]) -> set[str]:
+    """Get the ids of the documents of changed files. Files that are not files of a document
+    are ignored."""
+    changed_document_ids = set()
+    for file_name in changed_files:
+        try:
+            changed_document_ids.add(extract_document_id_from_path(Path(file_name)))
+        except ValueError:
+            continue
+    return changed_document_ids
+
+
+@dataclass(frozen=True)
+class WatchOptions:
+    debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS
+    max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS
+    max_retries: int = DEFAULT_MAX_RETRIES
+
+
+class LibraryWatcher:
+    """Poll a xochitl folder for changed files, and group the changes of a burst of file
+    events, like a sync from the tablet, in one batch of changed documents. A batch is only
+    given once no file changed for `options.debounce_seconds`, or once its first change is
+    `options.max_wait_seconds` old when files keep changing.
+    The documents that could not be exported are given again in a next batch, at most
+    `options.max_retries` times until their files change again.
+    """
+
+    def __init__(
+        self,
+        data_folder: Path,
+        options: WatchOptions = WatchOptions(),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.data_folder = data_folder
+        self.options = options
+        self._clock = clock
+        self._files_stat = scan_library_files(data_folder)
+        self._changed_document_ids: set[str] = set()
+        self._retries_per_document: dict[str, int] = {}
+        self._first_change_time: Optional[float] = None
+        self._last_change_time: Optional[float] = None
+
+    def poll(self) -> set[str]:
+        """Scan the folder once.
+
+        Returns:
+            ids of the changed documents, once the changes settled, nothing otherwise
+        """
+        files_stat = scan_library_files(self.data_folder)
+        changed_files = get_changed_files(self._files_stat, files_stat)
+        self._files_stat = files_stat
+        if changed_files:
+            changed_document_ids = get_changed_document_ids(changed_files)
+            for document_id in changed_document_ids:
+                self._retries_per_document.pop(document_id, None)
+            self._add_changes(changed_document_ids)
+        if self._first_change_time is None or self._last_change_time is None:
+            return set()
+        now = self._clock()
+        if (
+            now - self._last_change_time < self.options.debounce_seconds
+            and now - self._first_change_time < self.options.max_wait_seconds
+        ):
+            return set()
+        changed_document_ids = self._changed_document_ids
+        self._changed_document_ids = set()
+        self._first_change_time = None
+        self._last_change_time = None
+        return changed_document_ids
+
+    def retry(self, document_ids: Iterable[str]) -> set[str]:
+        """Give again documents that could not be exported in a next batch, once the debounce
+        delay passed.
+
+        Returns:
+            ids of the documents given up, as they were retried `max_retries` times already
+        """
+        retried_document_ids = set()
+        given_up_document_ids = set()
+        for document_id in document_ids:
+            retries = self._retries_per_document.get(document_id, 0)
+            if retries >= self.options.max_retries:
+                self._retries_per_document.pop(document_id, None)
+                given_up_document_ids.add(document_id)
+            else:
+                self._retries_per_document[document_id] = retries + 1
+                retried_document_ids.add(document_id)
+        if retried_document_ids:
+            self._add_changes(retried_document_ids)
+        return given_up_document_ids
+
+    def _add_changes(self, document_ids: set[str]) -> None:
+        self._last_change_time = self._clock()
+        if self._first_change_time is None:
+            self._first_change_time = self._last_change_time
+        self._changed_document_ids.update(document_ids)
+
+
+def watch_library(
+    watcher: LibraryWatcher,
+    export_documents: Callable[[set[str]], None],
+    poll_interval_seconds: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    stop_event: Optional[threading.Event] = None,
+) -> None:
+    """Export the changed documents of each batch of the watcher, until `stop_event` is set.
+    A batch is exported before polling again, so the changes made meanwhile are in the next
+    batch.
+
+    Args:
+        watcher: watcher of the library folder
+        export_documents: called with the ids of the changed documents of each batch
+        poll_interval_seconds: time between two scans of the folder. Defaults to 2 seconds.
+        stop_event: event to stop watching. Defaults to None, which watches forever.
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        if changed_document_ids := watcher.poll():
+            export_documents(changed_document_ids)
+        stop_event.wait(poll_interval_seconds)
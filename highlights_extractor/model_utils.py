@@ -1,15 +1,43 @@
-from typing import Dict, Generator, Iterator
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Collection,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    Optional,
+)
 
-from highlights_extractor.constants import DATA_FOLDER
+from highlights_extractor.instrumentation import PipelineTrace, stage, trace_document
 from highlights_extractor.models import (
     ChapterHighlights,
+    Document,
     DocumentContent,
     DocumentHighlights,
     DocumentMetadata,
     PageHighlights,
+    PageImage,
 )
-from highlights_extractor.process_documents import PDFExtractor
 from highlights_extractor.repository.file_reader import FileReader, RawHighlightFile
+from highlights_extractor.repository.image_cache import PageImageCache
+
+if TYPE_CHECKING:
+    from highlights_extractor.pdf_document_pool import PDFDocumentPool
+    from highlights_extractor.process_documents import PDFExtractor
+    from highlights_extractor.repository.knowledge_manager_writer import (
+        ObsidianDocument,
+    )
+
+
+@dataclass(frozen=True)
+class ExtractionResources:
+    """Caches, pool of open PDF documents and trace shared by the extractions of the
+    documents of a library. Each of them is optional."""
+
+    image_cache: Optional[PageImageCache] = None
+    document_pool: Optional["PDFDocumentPool"] = None
+    trace: Optional[PipelineTrace] = None
 
 
 def sort_page_highlights(
@@ -31,10 +59,10 @@ def create_chapter_highlights(
 
 
 def get_highlights_per_chapter(
-    raw_highlight_files: list[RawHighlightFile],
+    raw_highlight_files: Iterable[RawHighlightFile],
     is_saving_images: bool,
     document_content: DocumentContent,
-    pdf_reader: PDFExtractor,
+    pdf_reader: "PDFExtractor",
 ) -> list[ChapterHighlights]:
     all_highlights = sort_page_highlights(
         create_highlights(raw_highlight_files, is_saving_images, document_content, pdf_reader)
@@ -44,35 +72,53 @@ def get_highlights_per_chapter(
 
 
 def create_highlights(
-    raw_highlight_files: list[RawHighlightFile],
+    raw_highlight_files: Iterable[RawHighlightFile],
     is_saving_images: bool,
     document_content: DocumentContent,
-    pdf_reader: PDFExtractor,
+    pdf_reader: "PDFExtractor",
 ) -> Generator[PageHighlights, None, None]:
+    # the page number of each file is resolved as soon as the file is read, then the
+    # chapters of all the pages are looked up at once
+    highlight_files = []
+    page_numbers = []
     for highlight_file in raw_highlight_files:
-        page_number = get_page_number(document_content, highlight_file)
-        image = (
-            pdf_reader.get_page_image(page_number, highlight_file) if is_saving_images else None
-        )
+        highlight_files.append(highlight_file)
+        with stage("get_page_number"):
+            page_numbers.append(get_page_number(document_content, highlight_file))
+    with stage("get_chapter_titles"):
+        chapters = pdf_reader.get_chapter_titles(page_numbers)
+    for highlight_file, page_number, chapter in zip(highlight_files, page_numbers, chapters):
+        image = PageImage(pdf_reader, page_number, highlight_file) if is_saving_images else None
         yield PageHighlights(
             raw_file=highlight_file,
             page_number=page_number,
-            chapter=pdf_reader.get_chapter_title(page_number),
+            chapter=chapter,
             image=image,
         )
 
 
 def get_document_highlights(
-    local_fs: FileReader, document_metadata: DocumentMetadata, is_saving_images: bool
+    local_fs: FileReader,
+    document_metadata: DocumentMetadata,
+    is_saving_images: bool,
+    resources: ExtractionResources = ExtractionResources(),
 ) -> DocumentHighlights:
+    # fitz, numpy and PIL are only imported once a PDF is read
+    # pylint: disable=import-outside-toplevel
+    from highlights_extractor.process_documents import PDFExtractor
+
     document_content = DocumentContent(
         local_fs.read_document_content(document_id=document_metadata.document_id)
     )
-    highlights_files = local_fs.read_document_highlights(document_metadata.document_id)
-    pdf_reader = PDFExtractor(
-        DATA_FOLDER / f"{document_metadata.document_id}.pdf",
-        document_name=document_metadata.document_name,
-    )
+    with stage("open_pdf"):
+        pdf_reader = PDFExtractor(
+            local_fs.get_document_pdf_path(document_metadata.document_id),
+            document_name=document_metadata.document_name,
+            image_cache=resources.image_cache,
+            document_pool=resources.document_pool,
+            document_stream=local_fs.read_document_pdf_stream(document_metadata.document_id),
+        )
+    highlights_files = local_fs.iter_document_highlights(document_metadata.document_id)
     chapter_highlights = get_highlights_per_chapter(
         highlights_files,
         is_saving_images,
@@ -82,22 +128,41 @@ def get_document_highlights(
     return DocumentHighlights(chapter_highlights, document_metadata.document_id)
 
 
+def extract_document(
+    local_fs: FileReader,
+    document_metadata: DocumentMetadata,
+    obsidian_document: "ObsidianDocument",
+    resources: ExtractionResources = ExtractionResources(),
+    page_ids_to_save: Optional[Collection[str]] = None,
+) -> Document:
+    """Get the highlights of a document and write them with `obsidian_document`, see
+    `ObsidianDocument.extract_document`."""
+    with trace_document(resources.trace, document_metadata.document_id):
+        document_highlights = get_document_highlights(
+            local_fs, document_metadata, obsidian_document.is_saving_images, resources
+        )
+        document = Document(document_highlights, document_metadata)
+        obsidian_document.extract_document(document, page_ids_to_save)
+    return document
+
+
 def get_page_number(document_content: DocumentContent, page: RawHighlightFile) -> int:
     """Get the page number of a page in the document.
     To do so, we need the content file of the document and the page id of the page
     in the content file, there is two list:
         - One with the page ids
         - One with the page numbers
-    We need to find the index of the corresponding page id in the list of page ids
-    to get the corresponding page number.
+    The content indexes the page number of each page id once, so finding the
+    corresponding page number does not scan the list of page ids.
 
     Args:
         document_content: content document to get the two lists
         page: page to get the page id
 
+    Raises:
+        PageNotFoundError: if the page is not in the content file or has no page number
+
     Returns:
         page number of the page
     """
-    page_remarkable_index = document_content.remarkable_page_ids.index(page.page_id)
-    page_number = document_content.page_numbers[page_remarkable_index]
-    return page_number
+    return document_content.get_page_number(page.page_id)
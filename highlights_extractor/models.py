@@ -1,38 +1,136 @@
-from dataclasses import dataclass
-from typing import Iterator, Optional
-
-from PIL import Image
+from dataclasses import InitVar, dataclass, field
+from enum import Enum
+from itertools import groupby
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Protocol, Sequence
 
+from highlights_extractor.config.exceptions import PageNotFoundError
 from highlights_extractor.path_utils import extract_document_id_from_path
-from highlights_extractor.repository.file_reader import RawFile, RawHighlightFile
+from highlights_extractor.repository.file_reader import (  # pylint: disable=unused-import
+    Highlights,
+    RawFile,
+    RawHighlightFile,
+)
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class ImageFormat(Enum):
+    JPEG = "jpeg"
+    PNG = "png"
+    WEBP = "webp"
+
+    @property
+    def extension(self) -> str:
+        return self.value
+
+
+DEFAULT_CLIP_PADDING = 20.0
+DEFAULT_IMAGE_ZOOM = 1
+
 
+@dataclass(frozen=True)
+class ImageExportOptions:
+    image_format: ImageFormat = ImageFormat.JPEG
+    quality: int = 75
+    # padding, in PDF points, around the highlighted area of a page when only this area is
+    # rendered. The whole page is rendered when it is None.
+    clip_padding: Optional[float] = None
 
-@dataclass
-class Highlights:
-    color: int
-    length: int
-    rects: list[dict]
-    start: int
-    text: str
 
+class PageRenderer(Protocol):
+    """Renderer of the page images, only with the arguments the page images pass to it."""
 
-@dataclass
+    def get_page_image(
+        self, page_number: int, highlight_file: RawHighlightFile, image_zoom: int
+    ) -> "Image.Image":
+        ...
+
+    def save_pages_images(
+        self,
+        pages: Sequence[tuple[int, RawHighlightFile, Path]],
+        image_zoom: int,
+        export_options: ImageExportOptions,
+        render_processes: int,
+    ) -> Iterator[Path]:
+        ...
+
+
+@dataclass(slots=True)
+class PageImage:
+    """Image of a highlighted page, rendered only when it is shown or exported."""
+
+    renderer: PageRenderer
+    page_number: int
+    highlight_file: RawHighlightFile
+    image_zoom: int = DEFAULT_IMAGE_ZOOM
+
+    def render(self) -> "Image.Image":
+        return self.renderer.get_page_image(self.page_number, self.highlight_file, self.image_zoom)
+
+
+def save_page_images(
+    page_images: Sequence[tuple[PageImage, Path]],
+    export_options: ImageExportOptions = ImageExportOptions(),
+    render_processes: int = 1,
+) -> list[Path]:
+    """Render and write page images one after the other, so no rendered image is kept
+    in memory. Consecutive images of the same renderer are saved together, to spread them
+    over `render_processes` processes.
+
+    Args:
+        page_images: images to save with the path of their file
+        export_options: format and quality of the image files. Defaults to JPEG.
+        render_processes: number of processes rendering the images of a document. Defaults to 1.
+
+    Returns:
+        path of each written image file, in the same order
+    """
+    saved_paths: list[Path] = []
+    for _, same_renderer_images in groupby(
+        page_images,
+        key=lambda image_to_save: (id(image_to_save[0].renderer), image_to_save[0].image_zoom),
+    ):
+        images_to_save = list(same_renderer_images)
+        first_page_image = images_to_save[0][0]
+        saved_paths.extend(
+            first_page_image.renderer.save_pages_images(
+                [
+                    (page_image.page_number, page_image.highlight_file, file_path)
+                    for page_image, file_path in images_to_save
+                ],
+                first_page_image.image_zoom,
+                export_options,
+                render_processes,
+            )
+        )
+    return saved_paths
+
+
+@dataclass(slots=True)
 class PageHighlights:
-    raw_file: RawHighlightFile
+    """Texts highlighted on a page. The highlight file is not kept, only the image of the page
+    keeps it, to render the highlights."""
+
+    raw_file: InitVar[RawHighlightFile]
     page_number: int
     chapter: str = ""
-    image: Optional[Image.Image] = None
+    image: Optional[PageImage] = None
+    page_id: str = field(init=False)
+    document_id: str = field(init=False)
+    highlights: list[str] = field(init=False)
 
-    def __post_init__(self) -> None:
-        self.page_id = self.raw_file.page_id
-        self.document_id = self.raw_file.document_id
-        self.highlights = [highlight["text"] for highlight in self.raw_file.content]
+    def __post_init__(self, raw_file: RawHighlightFile) -> None:
+        self.page_id = raw_file.page_id
+        self.document_id = raw_file.document_id
+        self.highlights = [highlight.text for highlight in raw_file.content]
 
     def __repr__(self) -> str:
         return str(self.highlights)
 
 
-@dataclass
+@dataclass(slots=True)
 class ChapterHighlights:
     chapter: str
     page_highlights: list[PageHighlights]
@@ -44,7 +142,7 @@ class ChapterHighlights:
         return iter(self.page_highlights)
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentHighlights:
     chapters_highlights: list[ChapterHighlights]
     document_id: str
@@ -56,22 +154,26 @@ class DocumentHighlights:
         return iter(self.chapters_highlights)
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentMetadata:
-    raw_file: RawFile
+    raw_file: InitVar[RawFile]
+    document_id: str = field(init=False)
+    document_name: str = field(init=False)
 
-    def __post_init__(self) -> None:
-        self.document_id = self.raw_file.document_id
-        self.document_name = self.raw_file.content["visibleName"]
+    def __post_init__(self, raw_file: RawFile) -> None:
+        self.document_id = raw_file.document_id
+        self.document_name = raw_file.content["visibleName"]
 
     def __repr__(self) -> str:
         return self.document_name
 
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     document_highlights: DocumentHighlights
     document_metadata: DocumentMetadata
+    name: str = field(init=False)
+    highlights: list[ChapterHighlights] = field(init=False)
 
     def __post_init__(
         self,
@@ -83,12 +185,36 @@ class Document:
         return iter(self.highlights)
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentContent:
-    raw_file: RawFile
-
-    def __post_init__(self) -> None:
-        self.document_id = extract_document_id_from_path(self.raw_file.file_path)
-        self.remarkable_page_ids = self.raw_file.content.get("pages", [])
-        self.page_numbers = self.raw_file.content.get("redirectionPageMap", [])
-        self.file_type = self.raw_file.content.get("FileType", "")
+    raw_file: InitVar[RawFile]
+    document_id: str = field(init=False)
+    remarkable_page_ids: list[str] = field(init=False)
+    page_numbers: list[int] = field(init=False)
+    file_type: str = field(init=False)
+    page_numbers_by_page_id: dict[str, int] = field(init=False)
+
+    def __post_init__(self, raw_file: RawFile) -> None:
+        self.document_id = extract_document_id_from_path(raw_file.file_path)
+        self.remarkable_page_ids = raw_file.content.get("pages", [])
+        self.page_numbers = raw_file.content.get("redirectionPageMap", [])
+        self.file_type = raw_file.content.get("FileType", "")
+        self.page_numbers_by_page_id = self._index_page_numbers()
+
+    def _index_page_numbers(self) -> dict[str, int]:
+        page_numbers_by_page_id: dict[str, int] = {}
+        for page_id, page_number in zip(self.remarkable_page_ids, self.page_numbers):
+            page_numbers_by_page_id.setdefault(page_id, page_number)
+        return page_numbers_by_page_id
+
+    def get_page_number(self, page_id: str) -> int:
+        if (page_number := self.page_numbers_by_page_id.get(page_id)) is not None:
+            return page_number
+        if page_id in self.remarkable_page_ids:
+            raise PageNotFoundError(
+                f"Page {page_id} of document {self.document_id} has no page number"
+                " in the redirectionPageMap of its content file"
+            )
+        raise PageNotFoundError(
+            f"Page {page_id} is not in the content file of document {self.document_id}"
+        )
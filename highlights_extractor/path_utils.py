@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Iterator
 
 
 def extract_document_id_from_path(path: Path) -> str:
@@ -22,12 +23,16 @@ def extract_page_id_from_path(path: Path) -> str:
             raise ValueError(f"{path} is not an expected Xochitl page file")
 
 
-def recursive_function_to_get_all_dicts(highlights: list) -> list:
-    list_of_dict = []
-    for dict_or_list in highlights:
-        if isinstance(dict_or_list, dict):
-            list_of_dict.append(dict_or_list)
+def iter_all_dicts(nested_lists: list) -> Iterator[dict]:
+    """Yield the dicts of nested lists in depth-first order, without recursion nor copies
+    of the lists."""
+    stack = [iter(nested_lists)]
+    while stack:
+        for dict_or_list in stack[-1]:
+            if isinstance(dict_or_list, dict):
+                yield dict_or_list
+            else:
+                stack.append(iter(dict_or_list))
+                break
         else:
-            list_of_dict = list_of_dict + recursive_function_to_get_all_dicts(dict_or_list)
-
-    return list_of_dict
+            stack.pop()
@@ -0,0 +1,112 @@
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from highlights_extractor.repository.image_cache import CacheStats
+
+if TYPE_CHECKING:
+    import fitz
+
+DEFAULT_POOLED_DOCUMENTS = 8
+
+
+def get_pdf_key(document_path: Path, document_stream: Optional[bytes] = None) -> tuple[str, int]:
+    """Identify a PDF file by its path and modification time, and a PDF read in memory by
+    its path and checksum, as it has no modification time."""
+    if document_stream is not None:
+        return (str(document_path), zlib.crc32(document_stream))
+    return (str(document_path.resolve()), document_path.stat().st_mtime_ns)
+
+
+def open_pdf_document(
+    document_path: Path, document_stream: Optional[bytes] = None
+) -> "fitz.Document":
+    import fitz  # pylint: disable=import-outside-toplevel
+
+    if document_stream is not None:
+        return fitz.Document(stream=document_stream, filetype="pdf")
+    return fitz.Document(document_path)
+
+
+@dataclass
+class PDFDocumentLease:
+    """Open PDF document lent by a pool, with the lock to hold while modifying its pages."""
+
+    key: tuple[str, int]
+    document: "fitz.Document"
+    render_lock: threading.RLock = field(default_factory=threading.RLock)
+
+
+@dataclass
+class _PooledDocument:
+    lease: PDFDocumentLease
+    leases_count: int = 0
+
+
+class PDFDocumentPool:
+    """Least recently used pool of open PDF documents, keyed by their path and modification
+    time, or by the checksum of the PDFs opened from memory, so extracting the same document
+    again does not open it again.
+    A document is leased until it is released, and is only closed when it is evicted while
+    not leased. The pool can hold more than `max_documents` documents while they are leased.
+    """
+
+    def __init__(self, max_documents: int = DEFAULT_POOLED_DOCUMENTS) -> None:
+        self.max_documents = max_documents
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._documents: "OrderedDict[tuple[str, int], _PooledDocument]" = OrderedDict()
+
+    def acquire(
+        self, document_path: Path, document_stream: Optional[bytes] = None
+    ) -> PDFDocumentLease:
+        key = get_pdf_key(document_path, document_stream)
+        with self._lock:
+            pooled_document = self._documents.get(key)
+            if pooled_document:
+                self.stats.hits += 1
+                self._documents.move_to_end(key)
+                pooled_document.leases_count += 1
+                return pooled_document.lease
+            self.stats.misses += 1
+
+        lease = PDFDocumentLease(key, open_pdf_document(document_path, document_stream))
+        with self._lock:
+            pooled_document = self._documents.setdefault(key, _PooledDocument(lease))
+            if pooled_document.lease is not lease:
+                # another thread opened the same document meanwhile
+                lease.document.close()
+            pooled_document.leases_count += 1
+            self._evict()
+            return pooled_document.lease
+
+    def release(self, lease: PDFDocumentLease) -> None:
+        with self._lock:
+            pooled_document = self._documents.get(lease.key)
+            if pooled_document is None or pooled_document.lease is not lease:
+                return
+            pooled_document.leases_count -= 1
+            self._evict()
+
+    def close(self) -> None:
+        """Close all the documents of the pool, even the leased ones."""
+        with self._lock:
+            for pooled_document in self._documents.values():
+                pooled_document.lease.document.close()
+            self._documents.clear()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _evict(self) -> None:
+        evictable_keys = [
+            key
+            for key, pooled_document in self._documents.items()
+            if pooled_document.leases_count == 0
+        ]
+        for key in evictable_keys[: max(len(self._documents) - self.max_documents, 0)]:
+            self._documents.pop(key).lease.document.close()
+            self.stats.evictions += 1
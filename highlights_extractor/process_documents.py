@@ -1,14 +1,27 @@
-import io
+import bisect
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property
+from itertools import repeat
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Sequence
 
 import fitz
-import pandas as pd
+import numpy as np
 from PIL import Image
 
 from highlights_extractor.config.exceptions import DocumentNotProcessableError
-from highlights_extractor.repository.file_reader import RawHighlightFile
+from highlights_extractor.instrumentation import is_tracing, record_bytes, stage
+from highlights_extractor.models import ImageExportOptions, ImageFormat
+from highlights_extractor.pdf_document_pool import (
+    PDFDocumentLease,
+    PDFDocumentPool,
+    get_pdf_key,
+    open_pdf_document,
+)
+from highlights_extractor.repository.file_reader import Highlights, RawHighlightFile
+from highlights_extractor.repository.image_cache import PageImageCache
 
 REMARKABLE_HEIGHT = 1872
 REMARKABLE_WIDTH = 1300
@@ -23,21 +36,82 @@ class TableOfContentItem:
     page: int
 
 
+@dataclass
+class TableOfContentsIndex:
+    """Table of contents sorted by the first page of each chapter, to find
+    the chapter of a page with a binary search instead of a scan.
+    """
+
+    pages: list[int]
+    titles: list[str]
+
+    @classmethod
+    def from_items(
+        cls, table_of_content_items: List[TableOfContentItem]
+    ) -> "TableOfContentsIndex":
+        pages: list[int] = []
+        titles: list[str] = []
+        for item in sorted(table_of_content_items, key=lambda item: item.page):
+            # when several chapters start on the same page, the first one of the table wins
+            if pages and pages[-1] == item.page:
+                continue
+            pages.append(item.page)
+            titles.append(item.title)
+        return cls(pages, titles)
+
+    def find_chapter_title(self, page_number: int) -> Optional[str]:
+        chapter_index = bisect.bisect_right(self.pages, page_number) - 1
+        if chapter_index < 0:
+            return None
+        return self.titles[chapter_index]
+
+    def find_chapter_titles(self, page_numbers: Sequence[int]) -> list[Optional[str]]:
+        chapter_indexes = np.searchsorted(self.pages, page_numbers, side="right") - 1
+        return [
+            self.titles[chapter_index] if chapter_index >= 0 else None
+            for chapter_index in chapter_indexes.tolist()
+        ]
+
+
 class PDFExtractor:
-    """Class to read and extract information from a PDF document."""
+    """Class to read and extract information from a PDF document, opened from its path, or
+    from `document_stream` when the PDF is read in memory."""
 
-    def __init__(self, document_path: Path, document_name: str) -> None:
-        self.reader = self._get_fitz_reader(document_path)
+    def __init__(
+        self,
+        document_path: Path,
+        document_name: str,
+        image_cache: Optional[PageImageCache] = None,
+        document_pool: Optional[PDFDocumentPool] = None,
+        *,
+        document_stream: Optional[bytes] = None,
+    ) -> None:
+        self.document_path = document_path
         self.document_name = document_name
+        self.image_cache = image_cache
+        self.document_stream = document_stream
+        if document_pool is None:
+            document = open_pdf_document(document_path, document_stream)
+            lease = PDFDocumentLease((str(document_path), 0), document)
+            self._close = weakref.finalize(self, document.close)
+        else:
+            lease = document_pool.acquire(document_path, document_stream)
+            self._close = weakref.finalize(self, document_pool.release, lease)
+        self.reader = lease.document
+        # extractors and pooled documents can be shared between threads, and a page is
+        # modified while rendered
+        self._render_lock = lease.render_lock
 
-    def _get_fitz_reader(self, document_path: Path) -> fitz.Document:
-        return fitz.Document(document_path)
+    def close(self) -> None:
+        """Close the PDF document, or give it back to its pool. It is done when the extractor
+        is garbage collected otherwise."""
+        self._close()
 
     def get_chapter_title(self, page_number: int) -> str:
         """Get the chapter title for a given page number.
-        The way this works is that it gets the table of contents and then
-        take the page number of the highlight page, find it in the table of contents
-        and return the corresponding chapter title.
+        The way this works is that it gets the table of contents (parsed only once per
+        document) and then take the page number of the highlight page, find it in the table
+        of contents and return the corresponding chapter title.
         Ex:
             If the table of contents is:
                 1. Introduction (page 1)
@@ -53,23 +127,43 @@ class PDFExtractor:
         Returns:
             the chapter title for the given page number
         """
-        table_of_content_items = self._get_raw_table_of_contents()
-        table_of_contents = self._get_table_of_contents_df(table_of_content_items)
-
-        only_chapters_before_current_page_df = self._get_only_chapters_before_current_page(
-            page_number, table_of_contents
-        )
-        if only_chapters_before_current_page_df.empty:
+        chapter_title = self._table_of_contents_index.find_chapter_title(page_number)
+        if chapter_title is None:
             raise DocumentNotProcessableError(
                 f"Could not find chapter title for page: {page_number} in {self.document_name}"
             )
-        chapter_corresponding_to_the_current_page = self._get_most_closest_chapter_before_page(
-            only_chapters_before_current_page_df
-        )
-        chapter_title = chapter_corresponding_to_the_current_page["title"]
-        if isinstance(chapter_title, str):
-            return chapter_title
-        return list(chapter_title)[0]
+        return chapter_title
+
+    def get_chapter_titles(self, page_numbers: Sequence[int]) -> list[str]:
+        """Get the chapter titles of many pages at once, with one search of all the
+        page numbers in the table of contents instead of one lookup per page.
+
+        Args:
+            page_numbers: page numbers of the highlights
+
+        Raises:
+            DocumentNotProcessableError: if the document does not have a table of contents
+                or if one of the pages is before the first chapter
+
+        Returns:
+            the chapter titles, in the same order as the page numbers
+        """
+        if not page_numbers:
+            return []
+        chapter_titles = []
+        for page_number, chapter_title in zip(
+            page_numbers, self._table_of_contents_index.find_chapter_titles(page_numbers)
+        ):
+            if chapter_title is None:
+                raise DocumentNotProcessableError(
+                    f"Could not find chapter title for page: {page_number} in {self.document_name}"
+                )
+            chapter_titles.append(chapter_title)
+        return chapter_titles
+
+    @cached_property
+    def _table_of_contents_index(self) -> TableOfContentsIndex:
+        return TableOfContentsIndex.from_items(self._get_raw_table_of_contents())
 
     def _get_raw_table_of_contents(self) -> List[TableOfContentItem]:
         if table_of_content := self.reader.get_toc():  # type: ignore
@@ -80,35 +174,12 @@ class PDFExtractor:
             " cannot be found."
         )
 
-    @staticmethod
-    def _get_table_of_contents_df(
-        raw_table_of_content: List[TableOfContentItem],
-    ) -> pd.DataFrame:
-        table_of_contents = pd.DataFrame(raw_table_of_content, columns=["level", "title", "page"])
-        return table_of_contents
-
-    def _get_only_chapters_before_current_page(
-        self, page_number: int, table_of_contents: pd.DataFrame
-    ) -> pd.DataFrame:
-        tmp_column = "difference_between_page_and_chapters"
-        table_of_contents = table_of_contents.assign(
-            **{tmp_column: lambda df: df["page"] - page_number}
-        )
-        only_chapters_with_page_number_less_than_current_page_df = table_of_contents[
-            table_of_contents[tmp_column] <= 0
-        ]
-        return only_chapters_with_page_number_less_than_current_page_df
-
-    def _get_most_closest_chapter_before_page(
-        self, only_chapters_before_current_page_df: pd.DataFrame
-    ) -> pd.DataFrame:
-        chapter_corresponding_to_the_current_page = only_chapters_before_current_page_df.iloc[
-            only_chapters_before_current_page_df["difference_between_page_and_chapters"].argmax()
-        ]
-        return chapter_corresponding_to_the_current_page
-
     def get_page_image(
-        self, page_number: int, highlight_file: RawHighlightFile, image_zoom: int = 1
+        self,
+        page_number: int,
+        highlight_file: RawHighlightFile,
+        image_zoom: int = 1,
+        clip_padding: Optional[float] = None,
     ) -> Image.Image:
         """Get the image of a page with the highlights on it. The highlights are
         extracted from the highlight file.
@@ -120,56 +191,262 @@ class PDFExtractor:
             highlight_file: raw highlight file that contains all the highlights boxes
             image_zoom: zoom to show and store the image. For example, a zoom of 2 means a better
                 quality of the image but it will be bigger in memory. Defaults to 1.
+            clip_padding: when set, only the area around the highlights is rendered, with this
+                padding in PDF points. Defaults to None, which renders the whole page.
 
         Returns:
             image of the page with the highlights on it
         """
-        pdf_page = self.reader.load_page(page_number)
-        highlights_boxes = self._get_highlights_boxes(highlight_file.content, pdf_page)
-        pdf_page.add_highlight_annot(highlights_boxes, clip=True)
-        image = self._create_image_python_object(image_zoom, pdf_page)
-        return image
+        pix = self._render_page_pixmap(
+            page_number, highlight_file.content, image_zoom, clip_padding
+        )
+        with stage("convert_image"):
+            return self._create_image_python_object(pix)
 
-    def _get_highlights_boxes(
-        self, highlight_contents: list[dict], pdf_page: fitz.Page
-    ) -> list[fitz.Quad]:
-        pdf_height = pdf_page.rect.height
-        pdf_width = pdf_page.rect.width
-        scale_width = pdf_width / REMARKABLE_WIDTH
-        scale_height = pdf_height / REMARKABLE_HEIGHT
-        highlights_boxes = []
-
-        for content in highlight_contents:
-            for rect in content["rects"]:
-                x1_highlight_in_pdf = rect["x"] * scale_width
-                x2_highlight_in_pdf = x1_highlight_in_pdf + (rect["width"] * scale_width)
-                y1_highlight_in_pdf = rect["y"] * scale_height
-                y2_highlight_in_pdf = y1_highlight_in_pdf + (rect["height"] * scale_height)
-                quad = self._create_quad(
-                    x1_highlight_in_pdf,
-                    x2_highlight_in_pdf,
-                    y1_highlight_in_pdf,
-                    y2_highlight_in_pdf,
+    def save_page_image(
+        self,
+        page_number: int,
+        highlight_file: RawHighlightFile,
+        file_path: Path,
+        image_zoom: int = 1,
+        *,
+        export_options: ImageExportOptions = ImageExportOptions(),
+    ) -> Path:
+        """Save the image of a page with the highlights on it, see `get_page_image`.
+        The rendered page is encoded once, straight into the file, without going through
+        a python image object. With an image cache, a page already rendered with the same
+        highlights and options is copied from the cache instead of being rendered again.
+
+        Args:
+            page_number: page number of the highlight
+            highlight_file: raw highlight file that contains all the highlights boxes
+            file_path: path of the image file to write
+            image_zoom: zoom to store the image. Defaults to 1.
+            export_options: format and quality of the image file. Defaults to JPEG.
+
+        Returns:
+            path of the written image file
+        """
+        cache_key = self._get_cache_key(page_number, highlight_file, image_zoom, export_options)
+        if self._copy_cached_page_image(cache_key, file_path):
+            return file_path
+        pix = self._render_page_pixmap(
+            page_number, highlight_file.content, image_zoom, export_options.clip_padding
+        )
+        with stage("encode_image"):
+            self._save_pixmap(pix, file_path, export_options)
+        if is_tracing():
+            record_bytes("encode_image", bytes_written=file_path.stat().st_size)
+        self._cache_page_image(cache_key, file_path)
+        return file_path
+
+    def save_pages_images(
+        self,
+        pages: Sequence[tuple[int, RawHighlightFile, Path]],
+        image_zoom: int = 1,
+        export_options: ImageExportOptions = ImageExportOptions(),
+        render_processes: int = 1,
+    ) -> Iterator[Path]:
+        """Save the images of many pages with the highlights on them, see `save_page_image`.
+        With more than one render process, the pages are rendered and written in a pool of
+        processes that each open their own fitz document, because fitz objects cannot be
+        shared between processes.
+
+        Args:
+            pages: page number, raw highlight file and image file path of each page to save
+            image_zoom: zoom to store the images. Defaults to 1.
+            export_options: format and quality of the image files. Defaults to JPEG.
+            render_processes: number of processes rendering the pages. Defaults to 1, which
+                renders the pages one after the other in the current process.
+
+        Yields:
+            path of each written image file, in the same order as the pages
+        """
+        if render_processes <= 1 or len(pages) <= 1:
+            for page_number, highlight_file, file_path in pages:
+                yield self.save_page_image(
+                    page_number,
+                    highlight_file,
+                    file_path,
+                    image_zoom,
+                    export_options=export_options,
+                )
+            return
+
+        pages_to_render = []
+        for page_number, highlight_file, file_path in pages:
+            cache_key = self._get_cache_key(
+                page_number, highlight_file, image_zoom, export_options
+            )
+            if not self._copy_cached_page_image(cache_key, file_path):
+                pages_to_render.append((page_number, highlight_file, file_path, cache_key))
+        if pages_to_render:
+            # the render and encoding stages of the worker processes are not traced
+            with stage("render_pages_in_processes"), ProcessPoolExecutor(
+                max_workers=min(render_processes, len(pages_to_render)),
+                initializer=_init_render_worker,
+                initargs=(self.document_path, self.document_name, self.document_stream),
+            ) as executor:
+                rendered_file_paths = executor.map(
+                    _save_page_in_worker,
+                    [page_number for page_number, _, _, _ in pages_to_render],
+                    [highlight_file.content for _, highlight_file, _, _ in pages_to_render],
+                    [file_path for _, _, file_path, _ in pages_to_render],
+                    repeat(image_zoom),
+                    repeat(export_options),
                 )
-                highlights_boxes.append(quad)
-        return highlights_boxes
+                for (_, _, _, cache_key), file_path in zip(pages_to_render, rendered_file_paths):
+                    self._cache_page_image(cache_key, file_path)
+        yield from (file_path for _, _, file_path in pages)
 
-    def _create_quad(
+    def _get_cache_key(
         self,
-        x1_highlight_in_pdf: float,
-        x2_highlight_in_pdf: float,
-        y1_highlight_in_pdf: float,
-        y2_highlight_in_pdf: float,
-    ) -> fitz.Quad:
-        point_1_top_left = fitz.Point(x1_highlight_in_pdf, y1_highlight_in_pdf)
-        point_2_top_right = fitz.Point(x2_highlight_in_pdf, y1_highlight_in_pdf)
-        point_3_bottom_left = fitz.Point(x1_highlight_in_pdf, y2_highlight_in_pdf)
-        point_4_bottom_right = fitz.Point(x2_highlight_in_pdf, y2_highlight_in_pdf)
-        return fitz.Quad(
-            point_1_top_left, point_2_top_right, point_3_bottom_left, point_4_bottom_right
+        page_number: int,
+        highlight_file: RawHighlightFile,
+        image_zoom: int,
+        export_options: ImageExportOptions,
+    ) -> Optional[str]:
+        if self.image_cache is None:
+            return None
+        return self.image_cache.make_key(
+            self._pdf_identity, page_number, highlight_file.content, image_zoom, export_options
         )
 
-    def _create_image_python_object(self, image_zoom: int, pdf_page: fitz.Page) -> Image.Image:
-        pix = pdf_page.get_pixmap(matrix=fitz.Matrix(image_zoom, image_zoom))  # type: ignore
-        image = Image.open(io.BytesIO(pix.pil_tobytes(format="jpeg")))
+    def _copy_cached_page_image(self, cache_key: Optional[str], file_path: Path) -> bool:
+        if self.image_cache is None or cache_key is None:
+            return False
+        with stage("image_cache"):
+            return self.image_cache.get(cache_key, file_path)
+
+    def _cache_page_image(self, cache_key: Optional[str], file_path: Path) -> None:
+        if self.image_cache is None or cache_key is None:
+            return
+        with stage("image_cache"):
+            self.image_cache.put(cache_key, file_path)
+
+    @cached_property
+    def _pdf_identity(self) -> str:
+        if self.document_stream is not None:
+            _, checksum = get_pdf_key(self.document_path, self.document_stream)
+            return f"{self.document_path.name}:{len(self.document_stream)}:{checksum}"
+        document_stat = self.document_path.stat()
+        return f"{self.document_path.name}:{document_stat.st_size}:{document_stat.st_mtime_ns}"
+
+    def _render_page_pixmap(
+        self,
+        page_number: int,
+        highlight_contents: list[Highlights],
+        image_zoom: int,
+        clip_padding: Optional[float] = None,
+    ) -> fitz.Pixmap:
+        with stage("render_page"), self._render_lock:
+            pdf_page = self.reader.load_page(page_number)
+            highlights_boxes = self._get_highlights_boxes(highlight_contents, pdf_page)
+            clip = (
+                None
+                if clip_padding is None
+                else self._get_clip_rect(highlights_boxes, pdf_page, clip_padding)
+            )
+            highlights_annotation = pdf_page.add_highlight_annot(highlights_boxes, clip=True)
+            pix = pdf_page.get_pixmap(  # type: ignore
+                matrix=fitz.Matrix(image_zoom, image_zoom), clip=clip
+            )
+            # the annotation is removed so that rendering the page again does not highlight it
+            # twice
+            pdf_page.delete_annot(highlights_annotation)
+        return pix
+
+    def _get_highlights_boxes(
+        self, highlight_contents: list[Highlights], pdf_page: fitz.Page
+    ) -> list[fitz.Quad]:
+        """Scale all the highlight rects of a page, from the reMarkable coordinates to the PDF
+        ones, at once, then create the quad of each rect from its four corners.
+        """
+        rects = np.array(
+            [rect for content in highlight_contents for rect in content.rects], dtype=np.float64
+        ).reshape(-1, 4)
+        scale = np.array(
+            [pdf_page.rect.width / REMARKABLE_WIDTH, pdf_page.rect.height / REMARKABLE_HEIGHT]
+        )
+        top_left = rects[:, :2] * scale
+        bottom_right = top_left + rects[:, 2:] * scale
+        # corners of each quad: top left, top right, bottom left, bottom right
+        quads_corners = np.stack(
+            [
+                top_left,
+                np.column_stack([bottom_right[:, 0], top_left[:, 1]]),
+                np.column_stack([top_left[:, 0], bottom_right[:, 1]]),
+                bottom_right,
+            ],
+            axis=1,
+        )
+        return [fitz.Quad(quad_corners) for quad_corners in quads_corners.tolist()]
+
+    @staticmethod
+    def _get_clip_rect(
+        highlights_boxes: list[fitz.Quad], pdf_page: fitz.Page, clip_padding: float
+    ) -> Optional[fitz.Rect]:
+        """Bounding box of all the highlights of a page, padded and kept inside the page.
+        The whole page is rendered when the page has no highlight box."""
+        if not highlights_boxes:
+            return None
+        clip = fitz.Rect(highlights_boxes[0].rect)
+        for highlight_box in highlights_boxes[1:]:
+            clip |= highlight_box.rect
+        return (
+            fitz.Rect(
+                clip.x0 - clip_padding,
+                clip.y0 - clip_padding,
+                clip.x1 + clip_padding,
+                clip.y1 + clip_padding,
+            )
+            & pdf_page.rect
+        )
+
+    @staticmethod
+    def _create_image_python_object(pix: fitz.Pixmap) -> Image.Image:
+        mode = "RGBA" if pix.alpha else "RGB"
+        image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
         return image
+
+    @staticmethod
+    def _save_pixmap(
+        pix: fitz.Pixmap, file_path: Path, export_options: ImageExportOptions
+    ) -> None:
+        if export_options.image_format is ImageFormat.PNG:
+            pix.save(str(file_path))
+        else:
+            pix.pil_save(
+                str(file_path),
+                format=export_options.image_format.name,
+                quality=export_options.quality,
+            )
+
+
+_WORKER_PDF_EXTRACTOR: Optional[PDFExtractor] = None
+
+
+def _init_render_worker(
+    document_path: Path, document_name: str, document_stream: Optional[bytes]
+) -> None:
+    global _WORKER_PDF_EXTRACTOR  # pylint: disable=global-statement
+    _WORKER_PDF_EXTRACTOR = PDFExtractor(
+        document_path, document_name, document_stream=document_stream
+    )
+
+
+def _save_page_in_worker(
+    page_number: int,
+    highlight_contents: list[Highlights],
+    file_path: Path,
+    image_zoom: int,
+    export_options: ImageExportOptions,
+) -> Path:
+    if _WORKER_PDF_EXTRACTOR is None:
+        raise RuntimeError("The render worker has not been initialized with a PDF document")
+    # pylint: disable=protected-access
+    pix = _WORKER_PDF_EXTRACTOR._render_page_pixmap(
+        page_number, highlight_contents, image_zoom, export_options.clip_padding
+    )
+    _WORKER_PDF_EXTRACTOR._save_pixmap(pix, file_path, export_options)
+    return file_path
@@ -0,0 +1,221 @@
+import bz2
+import gzip
+import io
+import lzma
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import IO, Callable, Optional, Union, cast
+
+from highlights_extractor.instrumentation import record_bytes, stage
+from highlights_extractor.path_utils import iter_all_dicts
+from highlights_extractor.repository.file_reader import (
+    FileReader,
+    Highlights,
+    RawFile,
+    RawHighlightFile,
+)
+from highlights_extractor.repository.json_backend import JsonBackend, get_json_backend
+
+# magic bytes of the compressions of a tar archive, with the function to decompress them
+TAR_DECOMPRESSORS_PER_MAGIC: dict[bytes, Callable[[Path], io.BufferedIOBase]] = {
+    b"\x1f\x8b": lambda path: gzip.open(path, "rb"),
+    b"BZh": lambda path: bz2.open(path, "rb"),
+    b"\xfd7zXZ\x00": lambda path: lzma.open(path, "rb"),
+}
+
+
+@dataclass(slots=True)
+class ArchiveMember:
+    name: str
+    size: int
+    mtime_ns: int
+    info: Union[zipfile.ZipInfo, tarfile.TarInfo]
+
+
+class ArchiveFileReader(FileReader):
+    """Reader of a backup of the xochitl folder in a zip or tar archive, without extracting it.
+    The members of the archive are indexed once, then each file is read from its offset in
+    the archive. A compressed tar cannot be read at an offset, so it is decompressed once in
+    a temporary file first. PDFs are read in memory and opened as streams.
+    The files of the library are found in the folder of the archive holding the metadata files,
+    whatever its name.
+    """
+
+    def __init__(self, archive_path: Path, json_backend: Optional[JsonBackend] = None) -> None:
+        self.archive_path = archive_path
+        self.json_backend = json_backend or get_json_backend()
+        self._lock = threading.Lock()
+        # decompressed tar, removed by the OS once closed
+        self._uncompressed_file: Optional[IO[bytes]] = None
+        self._archive = self._open_archive()
+        self._members, self._highlight_files_per_document = self._index_members()
+
+    def close(self) -> None:
+        self._archive.close()
+        if self._uncompressed_file is not None:
+            self._uncompressed_file.close()
+
+    def read_all_metadata_files(self, fields_to_keep: list[str]) -> list[RawFile]:
+        return self._read_all_files(".metadata", fields_to_keep)
+
+    def read_all_content_files(self, fields_to_keep: list[str]) -> list[RawFile]:
+        return self._read_all_files(".content", fields_to_keep)
+
+    def read_document_metadata(self, document_id: str, fields_to_keep: list[str]) -> RawFile:
+        file_data = self.read_json(f"{document_id}.metadata")
+        return RawFile(
+            file_path=self._get_path(f"{document_id}.metadata"),
+            content={key: file_data[key] for key in fields_to_keep},
+        )
+
+    def read_document_content(
+        self, document_id: str, fields_to_keep: Optional[list[str]] = None
+    ) -> RawFile:
+        file_data = self.read_json(f"{document_id}.content")
+        if fields_to_keep:
+            file_data = {key: file_data[key] for key in fields_to_keep}
+        return RawFile(file_path=self._get_path(f"{document_id}.content"), content=file_data)
+
+    def read_document_highlights(self, document_id: str) -> list[RawHighlightFile]:
+        return [
+            self._read_highlight_file(file_name)
+            for file_name in self._highlight_files_per_document.get(document_id, [])
+        ]
+
+    def get_document_pdf_path(self, document_id: str) -> Path:
+        return self._get_path(f"{document_id}.pdf")
+
+    def has_document_pdf(self, document_id: str) -> bool:
+        return f"{document_id}.pdf" in self._members
+
+    def read_document_pdf_stream(self, document_id: str) -> Optional[bytes]:
+        return self._read_member(f"{document_id}.pdf")
+
+    def get_document_files_mtimes(self, document_id: str) -> tuple[int, ...]:
+        """Get the modification times of the content, PDF and highlight files of a document,
+        as stored in the archive.
+        """
+        files_name = [
+            f"{document_id}.content",
+            f"{document_id}.pdf",
+            *self._highlight_files_per_document.get(document_id, []),
+        ]
+        return tuple(
+            member.mtime_ns if (member := self._members.get(file_name)) else 0
+            for file_name in files_name
+        )
+
+    def read_json(self, file_name: str) -> dict:
+        return self.json_backend.loads(self._read_member(file_name))
+
+    def _read_all_files(self, suffix: str, fields_to_keep: list[str]) -> list[RawFile]:
+        raw_files = []
+        for file_name in self._members:
+            if "/" in file_name or not file_name.endswith(suffix):
+                continue
+            file_data = self.read_json(file_name)
+            raw_files.append(
+                RawFile(
+                    file_path=self._get_path(file_name),
+                    content={key: file_data[key] for key in fields_to_keep},
+                )
+            )
+        return raw_files
+
+    def _read_highlight_file(self, file_name: str) -> RawHighlightFile:
+        file_data = self.read_json(file_name)
+        highlights = [
+            Highlights.from_dict(highlight)
+            for highlight in iter_all_dicts(file_data["highlights"])
+        ]
+        return RawHighlightFile(file_path=self._get_path(file_name), content=highlights)
+
+    def _read_member(self, file_name: str) -> bytes:
+        member = self._members.get(file_name)
+        if member is None:
+            raise FileNotFoundError(f"{file_name} is not in the archive {self.archive_path}")
+        with stage("read_files"), self._lock:
+            if isinstance(member.info, zipfile.ZipInfo):
+                file_bytes = cast(zipfile.ZipFile, self._archive).read(member.info)
+            else:
+                member_file = cast(tarfile.TarFile, self._archive).extractfile(member.info)
+                if member_file is None:
+                    raise FileNotFoundError(f"{file_name} is not a file of {self.archive_path}")
+                file_bytes = member_file.read()
+        record_bytes("read_files", bytes_read=len(file_bytes))
+        return file_bytes
+
+    def _get_path(self, file_name: str) -> Path:
+        # path of the file in the archive, only used to tell where it comes from
+        return self.archive_path / file_name
+
+    def _open_archive(self) -> Union[zipfile.ZipFile, tarfile.TarFile]:
+        if zipfile.is_zipfile(self.archive_path):
+            return zipfile.ZipFile(self.archive_path)
+        with open(self.archive_path, "rb") as archive_file:
+            magic = archive_file.read(6)
+        for tar_magic, decompress in TAR_DECOMPRESSORS_PER_MAGIC.items():
+            if magic.startswith(tar_magic):
+                self._uncompressed_file = tempfile.TemporaryFile()
+                try:
+                    with decompress(self.archive_path) as compressed_file:
+                        shutil.copyfileobj(compressed_file, self._uncompressed_file)
+                    self._uncompressed_file.seek(0)
+                    return tarfile.open(fileobj=self._uncompressed_file, mode="r:")
+                except BaseException:
+                    self._uncompressed_file.close()
+                    raise
+        return tarfile.open(self.archive_path, mode="r:")
+
+    def _index_members(self) -> tuple[dict[str, ArchiveMember], dict[str, list[str]]]:
+        if isinstance(self._archive, zipfile.ZipFile):
+            archive_members = [
+                ArchiveMember(
+                    info.filename,
+                    info.file_size,
+                    int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000,
+                    info,
+                )
+                for info in self._archive.infolist()
+                if not info.is_dir()
+            ]
+        else:
+            archive_members = [
+                ArchiveMember(info.name, info.size, int(info.mtime) * 1_000_000_000, info)
+                for info in self._archive.getmembers()
+                if info.isfile()
+            ]
+        library_folder = next(
+            (
+                PurePosixPath(member.name).parent
+                for member in archive_members
+                if member.name.endswith(".metadata")
+            ),
+            PurePosixPath("."),
+        )
+
+        members: dict[str, ArchiveMember] = {}
+        highlight_files_per_document: defaultdict[str, list[str]] = defaultdict(list)
+        for member in archive_members:
+            member_path = PurePosixPath(member.name)
+            if not member_path.is_relative_to(library_folder):
+                continue
+            file_name = str(member_path.relative_to(library_folder))
+            members[file_name] = member
+            highlights_folder, _, page_file_name = file_name.partition("/")
+            if (
+                highlights_folder.endswith(".highlights")
+                and page_file_name.endswith(".json")
+                and "/" not in page_file_name
+            ):
+                highlight_files_per_document[highlights_folder.removesuffix(".highlights")].append(
+                    file_name
+                )
+        return members, dict(highlight_files_per_document)
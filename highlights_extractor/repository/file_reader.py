@@ -1,47 +1,111 @@
 # %%
+import contextvars
 import glob
-import json
+import os
+import sys
 from abc import ABCMeta, abstractmethod
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
-from typing import Generator, Optional, Tuple
+from typing import Generator, Iterator, Optional, Tuple
 
 from highlights_extractor.constants import DATA_FOLDER
+from highlights_extractor.instrumentation import is_tracing, record_bytes, stage
 from highlights_extractor.path_utils import (
     extract_document_id_from_path,
     extract_page_id_from_path,
-    recursive_function_to_get_all_dicts,
+    iter_all_dicts,
 )
+from highlights_extractor.repository.json_backend import (
+    JsonBackend,
+    get_json_backend,
+    read_json_file,
+)
+from highlights_extractor.repository.metadata_catalog import MetadataCatalog
+
+DEFAULT_HIGHLIGHT_READ_WORKERS = 8
+
+# x, y, width and height of a highlighted rectangle, in reMarkable coordinates
+HighlightRect = Tuple[float, float, float, float]
 
 
-@dataclass
+@dataclass(slots=True)
 class RawFile:
     file_path: Path
     content: dict
+    document_id: str = field(init=False)
 
     def __post_init__(self) -> None:
-        self.document_id = extract_document_id_from_path(self.file_path)
+        self.document_id = sys.intern(extract_document_id_from_path(self.file_path))
+
+
+@dataclass(slots=True)
+class Highlights:
+    color: int
+    length: int
+    rects: tuple[HighlightRect, ...]
+    start: int
+    text: str
 
+    @classmethod
+    def from_dict(cls, highlight: dict) -> "Highlights":
+        return cls(
+            color=highlight.get("color", 0),
+            length=highlight.get("length", 0),
+            rects=tuple(
+                (rect["x"], rect["y"], rect["width"], rect["height"])
+                for rect in highlight.get("rects", [])
+            ),
+            start=highlight.get("start", 0),
+            text=highlight["text"],
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class RawHighlightFile:
     file_path: Path
-    content: list[dict]
+    content: list[Highlights]
+    page_id: str = field(init=False)
+    document_id: str = field(init=False)
 
     def __post_init__(self) -> None:
         self.page_id = extract_page_id_from_path(self.file_path)
-        self.document_id = extract_document_id_from_path(self.file_path)
+        # the id of a document is shared by all its highlight files
+        self.document_id = sys.intern(extract_document_id_from_path(self.file_path))
 
 
 class FileReader(metaclass=ABCMeta):
+    def __enter__(self) -> "FileReader":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the files kept open by the reader, if any."""
+
     @abstractmethod
     def read_all_metadata_files(self, fields_to_keep: list[str]) -> list[RawFile]:
         pass
 
+    @abstractmethod
+    def read_document_metadata(self, document_id: str, fields_to_keep: list[str]) -> RawFile:
+        pass
+
     @abstractmethod
     def read_document_highlights(self, document_id: str) -> list[RawHighlightFile]:
         pass
 
+    def iter_document_highlights(
+        self, document_id: str, max_workers: int = DEFAULT_HIGHLIGHT_READ_WORKERS
+    ) -> Iterator[RawHighlightFile]:
+        """Yield the highlight files of a document as soon as they are read, in no
+        particular order. Readers that cannot read files concurrently read them all first.
+        """
+        # pylint: disable=unused-argument
+        yield from self.read_document_highlights(document_id)
+
     @abstractmethod
     def read_all_content_files(self, fields_to_keep: list[str]) -> list[RawFile]:
         pass
@@ -52,17 +116,55 @@ class FileReader(metaclass=ABCMeta):
     ) -> RawFile:
         pass
 
+    @abstractmethod
+    def get_document_pdf_path(self, document_id: str) -> Path:
+        pass
+
+    def has_document_pdf(self, document_id: str) -> bool:
+        return self.get_document_pdf_path(document_id).exists()
+
+    def read_document_pdf_stream(self, document_id: str) -> Optional[bytes]:
+        """Read the PDF of a document in memory, for readers whose PDFs cannot be opened
+        from their path. None means that the PDF is opened from `get_document_pdf_path`.
+        """
+        # pylint: disable=unused-argument
+        return None
+
+    @abstractmethod
+    def get_document_files_mtimes(self, document_id: str) -> tuple[int, ...]:
+        pass
+
 
 class LocalFileReader(FileReader):
-    def __init__(self, data_folder: Path = DATA_FOLDER) -> None:
+    def __init__(
+        self,
+        data_folder: Path = DATA_FOLDER,
+        metadata_catalog: Optional[MetadataCatalog] = None,
+        json_backend: Optional[JsonBackend] = None,
+    ) -> None:
         self.data_folder = data_folder
+        self.metadata_catalog = metadata_catalog
+        self.json_backend = json_backend or get_json_backend()
 
     def read_all_metadata_files(self, fields_to_keep: list[str]) -> list[RawFile]:
-        return self._create_raw_file("*.metadata", fields_to_keep)
+        if self.metadata_catalog is None:
+            return self._create_raw_file("*.metadata", fields_to_keep)
+        self.metadata_catalog.refresh(self.data_folder, self.read_json)
+        return [
+            RawFile(file_path=self.data_folder / f"{document_id}.metadata", content=metadata)
+            for document_id, metadata in self.metadata_catalog.read_all_metadata(fields_to_keep)
+        ]
 
     def read_all_content_files(self, fields_to_keep: list[str]) -> list[RawFile]:
         return self._create_raw_file("*.content", fields_to_keep)
 
+    def read_document_metadata(self, document_id: str, fields_to_keep: list[str]) -> RawFile:
+        file_path = self.data_folder / f"{document_id}.metadata"
+        file_data = self.read_json(file_path)
+        return RawFile(
+            file_path=file_path, content={key: file_data[key] for key in fields_to_keep}
+        )
+
     def _create_raw_file(self, glob_expression: str, fields_to_keep: list[str]) -> list[RawFile]:
         all_content_files = [
             RawFile(
@@ -76,7 +178,7 @@ class LocalFileReader(FileReader):
     def read_document_content(
         self, document_id: str, fields_to_keep: Optional[list[str]] = None
     ) -> RawFile:
-        file_path = DATA_FOLDER / f"{document_id}.content"
+        file_path = self.data_folder / f"{document_id}.content"
         file_data = self.read_json(file_path)
         if fields_to_keep:
             file_content = {key: file_data[key] for key in fields_to_keep}
@@ -85,15 +187,74 @@ class LocalFileReader(FileReader):
         return RawFile(file_path=file_path, content=file_content)
 
     def read_document_highlights(self, document_id: str) -> list[RawHighlightFile]:
-        files = []
-        file_path = ""
-        for file_data, file_path in self.read_files_from_glob_expression(
-            str(DATA_FOLDER / f"{document_id}.highlights/*.json")
-        ):
-            data = recursive_function_to_get_all_dicts(file_data["highlights"])
-            files.append(RawHighlightFile(file_path=Path(file_path), content=data))
+        return [
+            self._read_highlight_file(Path(file_path))
+            for file_path in glob.glob(str(self.data_folder / f"{document_id}.highlights/*.json"))
+        ]
+
+    def iter_document_highlights(
+        self, document_id: str, max_workers: int = DEFAULT_HIGHLIGHT_READ_WORKERS
+    ) -> Iterator[RawHighlightFile]:
+        """Read the highlight files of a document with a pool of threads, and yield them
+        as soon as they are read so they can be processed while the others are read.
+        At most two files per thread are read or waiting to be consumed at the same time.
 
-        return files
+        Args:
+            document_id: id of the document
+            max_workers: number of files read at the same time. Defaults to 8.
+
+        Yields:
+            highlight files of the document, in the order they are read
+        """
+        files_path = iter(glob.glob(str(self.data_folder / f"{document_id}.highlights/*.json")))
+        executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+        try:
+            pending_reads: set[Future[RawHighlightFile]] = {
+                self._submit_highlight_file_read(executor, Path(file_path))
+                for file_path in islice(files_path, 2 * max(max_workers, 1))
+            }
+            while pending_reads:
+                done_reads, pending_reads = wait(pending_reads, return_when=FIRST_COMPLETED)
+                for file_path in islice(files_path, len(done_reads)):
+                    pending_reads.add(self._submit_highlight_file_read(executor, Path(file_path)))
+                for done_read in done_reads:
+                    yield done_read.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit_highlight_file_read(
+        self, executor: ThreadPoolExecutor, file_path: Path
+    ) -> "Future[RawHighlightFile]":
+        # the read runs in a copy of the current context, to be traced with its document
+        context = contextvars.copy_context()
+        return executor.submit(lambda: context.run(self._read_highlight_file, file_path))
+
+    def _read_highlight_file(self, file_path: Path) -> RawHighlightFile:
+        file_data = self.read_json(file_path)
+        highlights = [
+            Highlights.from_dict(highlight)
+            for highlight in iter_all_dicts(file_data["highlights"])
+        ]
+        return RawHighlightFile(file_path=file_path, content=highlights)
+
+    def get_document_pdf_path(self, document_id: str) -> Path:
+        return self.data_folder / f"{document_id}.pdf"
+
+    def get_document_files_mtimes(self, document_id: str) -> tuple[int, ...]:
+        """Get the modification times of the content, PDF and highlight files of a document,
+        to know if a document changed without reading its files.
+        """
+        files_path: list[Path] = [
+            self.data_folder / f"{document_id}.content",
+            self.get_document_pdf_path(document_id),
+            *map(
+                Path, sorted(glob.glob(str(self.data_folder / f"{document_id}.highlights/*.json")))
+            ),
+        ]
+        return tuple(
+            os.stat(file_path).st_mtime_ns if os.path.exists(file_path) else 0
+            for file_path in files_path
+        )
 
     def read_files_from_glob_expression(
         self, glob_expression: str
@@ -104,5 +265,8 @@ class LocalFileReader(FileReader):
             yield (file_data, file_path)
 
     def read_json(self, path: Path) -> dict:
-        with open(str(path), "rb") as json_file:
-            return json.load(json_file)
+        with stage("read_files"):
+            file_data = read_json_file(path, self.json_backend)
+        if is_tracing():
+            record_bytes("read_files", bytes_read=os.path.getsize(path))
+        return file_data
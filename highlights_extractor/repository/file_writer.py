@@ -0,0 +1,78 @@
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+WRITE_BUFFER_SIZE = 64 * 1024
+_COMPARE_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class WriteStats:
+    written: int = 0
+    skipped: int = 0
+
+
+class AtomicFileWriter:
+    """Write files atomically and only when their content changed.
+    A file is first written to a hidden temporary file next to it, which then replaces
+    the file if their contents differ, or is removed otherwise. Unchanged files are left
+    untouched, so tools watching the folder do not see them change.
+    """
+
+    def __init__(self) -> None:
+        self.stats = WriteStats()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_temporary_path(file_path: Path) -> Path:
+        return file_path.with_name(f".{file_path.stem}.{uuid.uuid4().hex}{file_path.suffix}")
+
+    def write_text_chunks(self, file_path: Path, chunks: Iterable[str]) -> bool:
+        """Write the chunks of a text file one after another through a buffered file, so
+        the whole file is never in memory.
+
+        Returns:
+            True if the file was written, False if it already had this content
+        """
+        temporary_path = self.get_temporary_path(file_path)
+        try:
+            with open(
+                temporary_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE
+            ) as temporary_file:
+                temporary_file.writelines(chunks)
+        except BaseException:
+            temporary_path.unlink(missing_ok=True)
+            raise
+        return self.replace_if_changed(temporary_path, file_path)
+
+    def replace_if_changed(self, temporary_path: Path, file_path: Path) -> bool:
+        """Move a temporary file to `file_path` if their contents differ, else remove it.
+
+        Returns:
+            True if the file was written, False if it already had this content
+        """
+        if file_path.exists() and _have_same_content(temporary_path, file_path):
+            temporary_path.unlink()
+            is_written = False
+        else:
+            os.replace(temporary_path, file_path)
+            is_written = True
+        with self._lock:
+            if is_written:
+                self.stats.written += 1
+            else:
+                self.stats.skipped += 1
+        return is_written
+
+
+def _have_same_content(first_path: Path, second_path: Path) -> bool:
+    if first_path.stat().st_size != second_path.stat().st_size:
+        return False
+    with open(first_path, "rb") as first_file, open(second_path, "rb") as second_file:
+        while first_chunk := first_file.read(_COMPARE_CHUNK_SIZE):
+            if first_chunk != second_file.read(_COMPARE_CHUNK_SIZE):
+                return False
+    return True
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from highlights_extractor.models import ImageExportOptions
+from highlights_extractor.repository.file_reader import Highlights
+
+DEFAULT_IMAGE_CACHE_SIZE = 1024**3
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class PageImageCache:
+    """Cache on disk of the rendered images of highlighted pages.
+    An image is stored under a hash of everything used to render it, so any change of the
+    PDF, of the highlights of the page or of the export options makes a new entry.
+    When the cache is bigger than `max_size_bytes`, the least recently used images are evicted.
+    """
+
+    def __init__(self, cache_folder: Path, max_size_bytes: int = DEFAULT_IMAGE_CACHE_SIZE) -> None:
+        self.cache_folder = cache_folder
+        self.max_size_bytes = max_size_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        self._entries_size = self._load_entries_size()
+        self._size_bytes = sum(self._entries_size.values())
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+    @staticmethod
+    def make_key(
+        pdf_identity: str,
+        page_number: int,
+        highlight_contents: list[Highlights],
+        image_zoom: int,
+        export_options: ImageExportOptions,
+    ) -> str:
+        key_content = [
+            pdf_identity,
+            page_number,
+            [highlight.rects for highlight in highlight_contents],
+            image_zoom,
+            export_options.image_format.value,
+            export_options.quality,
+            export_options.clip_padding,
+        ]
+        return hashlib.sha256(json.dumps(key_content, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str, file_path: Path) -> bool:
+        """Copy the cached image of `key` to `file_path`. The image can be evicted meanwhile
+        by another thread, or by another cache on the same folder, it is then a miss.
+
+        Args:
+            key: key of the image, see `make_key`
+            file_path: path where the image is copied
+
+        Returns:
+            True if the image was in the cache, False otherwise
+        """
+        with self._lock:
+            if key not in self._entries_size:
+                self.stats.misses += 1
+                return False
+            self._entries_size.move_to_end(key)
+        cached_file_path = self.cache_folder / key
+        try:
+            shutil.copyfile(cached_file_path, file_path)
+            os.utime(cached_file_path)
+        except FileNotFoundError:
+            with self._lock:
+                self._remove_entry(key)
+                self.stats.misses += 1
+            return False
+        with self._lock:
+            self.stats.hits += 1
+        return True
+
+    def put(self, key: str, file_path: Path) -> None:
+        temporary_file_path = self.cache_folder / f"{key}.{threading.get_ident()}.tmp"
+        shutil.copyfile(file_path, temporary_file_path)
+        os.replace(temporary_file_path, self.cache_folder / key)
+        with self._lock:
+            self._remove_entry(key)
+            self._entries_size[key] = file_path.stat().st_size
+            self._size_bytes += self._entries_size[key]
+            self._evict()
+
+    def _remove_entry(self, key: str) -> None:
+        self._size_bytes -= self._entries_size.pop(key, 0)
+
+    def _evict(self) -> None:
+        while self._size_bytes > self.max_size_bytes and len(self._entries_size) > 1:
+            key, size = self._entries_size.popitem(last=False)
+            (self.cache_folder / key).unlink(missing_ok=True)
+            self._size_bytes -= size
+            self.stats.evictions += 1
+
+    def _load_entries_size(self) -> "OrderedDict[str, int]":
+        cached_files = [
+            (entry.stat().st_mtime_ns, entry.name, entry.stat().st_size)
+            for entry in os.scandir(self.cache_folder)
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        ]
+        return OrderedDict((name, size) for _, name, size in sorted(cached_files))
@@ -0,0 +1,57 @@
+import json
+import mmap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+MMAP_MIN_SIZE_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class JsonBackend:
+    name: str
+    loads: Callable[[bytes], Any]
+    parses_buffers: bool = False
+
+
+STDLIB_JSON_BACKEND = JsonBackend("json", json.loads)
+JSON_BACKENDS = {STDLIB_JSON_BACKEND.name: STDLIB_JSON_BACKEND}
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional dependency
+    pass
+else:
+    JSON_BACKENDS["orjson"] = JsonBackend(
+        "orjson", orjson.loads, parses_buffers=True  # pylint: disable=no-member
+    )
+
+
+def get_json_backend(name: Optional[str] = None) -> JsonBackend:
+    """Get a JSON backend by its name, or the fastest installed one when no name is given.
+
+    Raises:
+        ValueError: if the backend is unknown or not installed
+    """
+    if name is None:
+        return JSON_BACKENDS.get("orjson", STDLIB_JSON_BACKEND)
+    if name not in JSON_BACKENDS:
+        raise ValueError(
+            f"JSON backend {name} is not available, installed backends: {list(JSON_BACKENDS)}"
+        )
+    return JSON_BACKENDS[name]
+
+
+def read_json_file(path: Path, json_backend: JsonBackend = STDLIB_JSON_BACKEND) -> Any:
+    """Parse a JSON file from its bytes, read in one call. Files of at least
+    `MMAP_MIN_SIZE_BYTES` are memory-mapped instead of copied in memory first.
+    """
+    with open(path, "rb") as json_file:
+        file_size = json_file.seek(0, 2)
+        if file_size < MMAP_MIN_SIZE_BYTES:
+            json_file.seek(0)
+            return json_backend.loads(json_file.read())
+        with mmap.mmap(json_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            if not json_backend.parses_buffers:
+                return json_backend.loads(mapped_file[:])
+            with memoryview(mapped_file) as mapped_bytes:
+                return json_backend.loads(mapped_bytes)
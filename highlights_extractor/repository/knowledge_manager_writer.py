@@ -1,21 +1,41 @@
 import abc
 from pathlib import Path
+from typing import Collection, Iterable, Iterator, Optional
 
-from highlights_extractor.models import Document
+from highlights_extractor.instrumentation import is_tracing, record_bytes, stage
+from highlights_extractor.models import (
+    DEFAULT_IMAGE_ZOOM,
+    Document,
+    ImageExportOptions,
+    PageImage,
+    save_page_images,
+)
+from highlights_extractor.repository.file_writer import AtomicFileWriter
 
 
 class MarkdownWriter:
     # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        self.file_writer = AtomicFileWriter()
+
     @staticmethod
     def _is_correct_markdown_file(file_path: Path) -> bool:
         return file_path.suffix == ".md"
 
-    def write_file(self, file_path: Path, data: str) -> None:
-        document_path = (
-            str(file_path) if self._is_correct_markdown_file(file_path) else f"{file_path}.md"
-        )
-        with open(document_path, "w", encoding="utf-8") as file:
-            file.write(data)
+    def get_markdown_path(self, file_path: Path) -> Path:
+        return file_path if self._is_correct_markdown_file(file_path) else Path(f"{file_path}.md")
+
+    def write_file(self, file_path: Path, data: str) -> bool:
+        return self.write_chunks(file_path, [data])
+
+    def write_chunks(self, file_path: Path, chunks: Iterable[str]) -> bool:
+        """Write the chunks of a markdown file, only if they changed its content."""
+        document_path = self.get_markdown_path(file_path)
+        with stage("write_markdown"):
+            is_written = self.file_writer.write_text_chunks(document_path, chunks)
+        if is_written and is_tracing():
+            record_bytes("write_markdown", bytes_written=document_path.stat().st_size)
+        return is_written
 
 
 class KnowLedgeManagerWriter(abc.ABC):
@@ -29,22 +49,44 @@ class KnowLedgeManagerWriter(abc.ABC):
 
 
 class ObsidianDocument(MarkdownWriter):
-    def __init__(self, vault_path: Path, image_path: Path, is_saving_images: bool = False) -> None:
+    def __init__(
+        self,
+        vault_path: Path,
+        image_path: Path,
+        is_saving_images: bool = False,
+        *,
+        render_processes: int = 1,
+        image_export_options: ImageExportOptions = ImageExportOptions(),
+    ) -> None:
+        super().__init__()
         self.vault_path = vault_path
         self.image_path = image_path
         self.is_saving_images = is_saving_images
+        self.render_processes = render_processes
+        self.image_export_options = image_export_options
+
+    def get_export_settings(self) -> dict:
+        """Settings that change the files written for a document."""
+        return {
+            "vault_path": str(self.vault_path.resolve()),
+            "image_path": str(self.image_path.resolve()),
+            "is_saving_images": self.is_saving_images,
+            "image_format": self.image_export_options.image_format.value,
+            "quality": self.image_export_options.quality,
+            "clip_padding": self.image_export_options.clip_padding,
+            "image_zoom": DEFAULT_IMAGE_ZOOM,
+        }
 
     def format_document(self, remarkable_document: Document) -> str:
-        obsidian_document_content = ""
+        return "".join(self.iter_document_chunks(remarkable_document))
+
+    def iter_document_chunks(self, remarkable_document: Document) -> Iterator[str]:
         for chapter_highlights in remarkable_document:
-            obsidian_document_content += self._add_header_2(str(chapter_highlights.chapter))
+            yield self._add_header_2(str(chapter_highlights.chapter))
             for page_highlights in chapter_highlights:
                 if self.is_saving_images:
-                    obsidian_document_content += self._add_image(
-                        remarkable_document.name, page_highlights.page_number
-                    )
-                obsidian_document_content += self._add_page_quotes(page_highlights.highlights)
-        return obsidian_document_content
+                    yield self._add_image(remarkable_document.name, page_highlights.page_number)
+                yield from self._iter_page_quotes(page_highlights.highlights)
 
     def _add_header_1(self, text: str) -> str:
         title = f"\n# {text}"
@@ -63,30 +105,80 @@ class ObsidianDocument(MarkdownWriter):
         return metadata
 
     def _add_image(self, document_name: str, page_number: int) -> str:
-        image = f"\n![[{document_name}_{page_number}.jpeg]]\n"
+        image = f"\n![[{self._get_image_file_name(document_name, page_number)}]]\n"
         return image
 
+    def _get_image_file_name(self, document_name: str, page_number: int) -> str:
+        return f"{document_name}_{page_number}.{self.image_export_options.image_format.extension}"
+
     def _add_page_quotes(self, page_quotes: list[str]) -> str:
-        formatted_quote = "\n```ad-quote\n"
-        for quote in page_quotes:
-            formatted_quote += f"{quote}\n"
-        formatted_quote = f"{formatted_quote}```"
-        return formatted_quote
+        return "".join(self._iter_page_quotes(page_quotes))
 
-    def extract_document(self, remarkable_document: Document) -> None:
-        formatted_document = self.format_document(remarkable_document)
-        self._export(remarkable_document.name, formatted_document)
+    def _iter_page_quotes(self, page_quotes: list[str]) -> Iterator[str]:
+        yield "\n```ad-quote\n"
+        for quote in page_quotes:
+            yield f"{quote}\n"
+        yield "```"
+
+    def extract_document(
+        self, remarkable_document: Document, page_ids_to_save: Optional[Collection[str]] = None
+    ) -> None:
+        """Write the note of the document and the images of its pages.
+
+        Args:
+            remarkable_document: document to export
+            page_ids_to_save: ids of the pages whose image is saved. Defaults to None,
+                which saves the images of all the pages.
+        """
+        self._export(remarkable_document.name, self.iter_document_chunks(remarkable_document))
         if self.is_saving_images:
-            self._save_pages_images(remarkable_document)
+            self._save_pages_images(remarkable_document, page_ids_to_save)
 
-    def _save_pages_images(self, remarkable_document: Document) -> None:
+    def get_exported_paths(self, remarkable_document: Document) -> list[Path]:
+        exported_paths = [self.get_markdown_path(self.vault_path / remarkable_document.name)]
+        if self.is_saving_images:
+            exported_paths.extend(
+                self.image_path
+                / self._get_image_file_name(remarkable_document.name, page_highlights.page_number)
+                for chapter_highlights in remarkable_document
+                for page_highlights in chapter_highlights
+                if page_highlights.image
+            )
+        return exported_paths
+
+    def _save_pages_images(
+        self, remarkable_document: Document, page_ids_to_save: Optional[Collection[str]] = None
+    ) -> None:
+        page_images: list[tuple[PageImage, Path]] = []
         for chapter_highlights in remarkable_document:
             for page_highlights in chapter_highlights:
+                if (
+                    page_ids_to_save is not None
+                    and page_highlights.page_id not in page_ids_to_save
+                ):
+                    continue
                 if page_highlights.image:
-                    page_highlights.image.save(
-                        self.image_path
-                        / f"{remarkable_document.name}_{page_highlights.page_number}.jpeg"
+                    image_file_name = self._get_image_file_name(
+                        remarkable_document.name, page_highlights.page_number
                     )
-
-    def _export(self, document_name: str, content: str) -> None:
-        self.write_file(self.vault_path / document_name, content)
+                    page_images.append((page_highlights.image, self.image_path / image_file_name))
+
+        # images are saved next to their final path, which they replace only if they changed
+        temporary_page_images = [
+            (page_image, self.file_writer.get_temporary_path(file_path))
+            for page_image, file_path in page_images
+        ]
+        try:
+            with stage("save_page_images"):
+                save_page_images(
+                    temporary_page_images, self.image_export_options, self.render_processes
+                )
+            with stage("replace_page_images"):
+                for (_, file_path), (_, temporary_path) in zip(page_images, temporary_page_images):
+                    self.file_writer.replace_if_changed(temporary_path, file_path)
+        finally:
+            for _, temporary_path in temporary_page_images:
+                temporary_path.unlink(missing_ok=True)
+
+    def _export(self, document_name: str, chunks: Iterable[str]) -> None:
+        self.write_chunks(self.vault_path / document_name, chunks)
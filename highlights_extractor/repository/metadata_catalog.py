@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Union
+
+CATALOG_COLUMNS_PER_FIELD = {"visibleName": "visible_name", "type": "document_type"}
+
+
+class MetadataCatalog:
+    """Catalog of the metadata files of a library, stored in SQLite.
+    Refreshing the catalog only stats the metadata files, and parses only the ones
+    that are new or whose modification time or size changed since the last refresh.
+    """
+
+    def __init__(self, catalog_path: Union[Path, str]) -> None:
+        if isinstance(catalog_path, Path):
+            catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(catalog_path), check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    visible_name TEXT,
+                    document_type TEXT,
+                    metadata_mtime_ns INTEGER NOT NULL,
+                    metadata_size INTEGER NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+
+    def refresh(self, data_folder: Path, read_json: Callable[[Path], dict]) -> int:
+        """Update the catalog with the metadata files of the data folder.
+
+        Args:
+            data_folder: folder of the library
+            read_json: function to read a metadata file
+
+        Returns:
+            number of metadata files parsed
+        """
+        metadata_files_stat = {
+            entry.name.removesuffix(".metadata"): entry.stat()
+            for entry in os.scandir(data_folder)
+            if entry.name.endswith(".metadata") and entry.is_file()
+        }
+        with self._lock, self._connection:
+            catalog_files_stat = {
+                document_id: (metadata_mtime_ns, metadata_size)
+                for document_id, metadata_mtime_ns, metadata_size in self._connection.execute(
+                    "SELECT document_id, metadata_mtime_ns, metadata_size FROM documents"
+                )
+            }
+            deleted_document_ids = catalog_files_stat.keys() - metadata_files_stat.keys()
+            self._connection.executemany(
+                "DELETE FROM documents WHERE document_id = ?",
+                [(document_id,) for document_id in deleted_document_ids],
+            )
+
+            changed_documents = []
+            for document_id, file_stat in metadata_files_stat.items():
+                if catalog_files_stat.get(document_id) != (
+                    file_stat.st_mtime_ns,
+                    file_stat.st_size,
+                ):
+                    file_data = read_json(data_folder / f"{document_id}.metadata")
+                    changed_documents.append(
+                        (
+                            document_id,
+                            file_data.get("visibleName"),
+                            file_data.get("type"),
+                            file_stat.st_mtime_ns,
+                            file_stat.st_size,
+                            json.dumps(file_data),
+                        )
+                    )
+
+            self._connection.executemany(
+                (
+                    "INSERT OR REPLACE INTO documents (document_id, visible_name, document_type,"
+                    " metadata_mtime_ns, metadata_size, metadata) VALUES (?, ?, ?, ?, ?, ?)"
+                ),
+                changed_documents,
+            )
+        return len(changed_documents)
+
+    def read_all_metadata(self, fields_to_keep: list[str]) -> list[tuple[str, dict]]:
+        """Read the metadata of all the documents of the catalog. Fields stored in their own
+        column are read without parsing the metadata.
+
+        Args:
+            fields_to_keep: fields of the metadata to read
+
+        Returns:
+            document id and metadata of each document, sorted by document id
+        """
+        if all(field in CATALOG_COLUMNS_PER_FIELD for field in fields_to_keep):
+            columns = ", ".join(CATALOG_COLUMNS_PER_FIELD[field] for field in fields_to_keep)
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT document_id, {columns} FROM documents ORDER BY document_id"
+                ).fetchall()
+            return [(row[0], dict(zip(fields_to_keep, row[1:]))) for row in rows]
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT document_id, metadata FROM documents ORDER BY document_id"
+            ).fetchall()
+        all_metadata = []
+        for document_id, metadata in rows:
+            file_data = json.loads(metadata)
+            all_metadata.append((document_id, {key: file_data[key] for key in fields_to_keep}))
+        return all_metadata
+
+    def close(self) -> None:
+        self._connection.close()
@@ -2,3 +2,5 @@ from pathlib import Path
 
 ROOT_TEST_FOLDER = Path(__file__).parent
 DATA_FOLDER = ROOT_TEST_FOLDER / "data"
+XOCHITL_DOCUMENT_ID = "1ef483b1-a177-488b-b942-c049adaed58c"
+XOCHITL_PAGE_IDS = ["page_id_0", "page_id_1", "page_id_2"]
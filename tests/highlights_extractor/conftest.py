@@ -1,17 +1,25 @@
 # pylint: disable=protected-access, redefined-outer-name
+import json
 from pathlib import Path
 from typing import Callable
 
+import fitz
 import pytest
 
 from highlights_extractor.models import (
     ChapterHighlights,
     Document,
+    DocumentContent,
     DocumentHighlights,
     DocumentMetadata,
     PageHighlights,
 )
-from highlights_extractor.repository.file_reader import RawFile, RawHighlightFile
+from highlights_extractor.repository.file_reader import (
+    Highlights,
+    RawFile,
+    RawHighlightFile,
+)
+from tests.constants import XOCHITL_DOCUMENT_ID, XOCHITL_PAGE_IDS
 
 
 @pytest.fixture
@@ -36,8 +44,8 @@ def make_raw_highlights(page_id: int) -> RawHighlightFile:
     return RawHighlightFile(
         Path(f"doc_id.highlights/page_id_{page_id}.json"),
         [
-            {"text": f"page_{page_id}_highlight_1"},
-            {"text": f"page_{page_id}_highlight_2"},
+            Highlights.from_dict({"text": f"page_{page_id}_highlight_1"}),
+            Highlights.from_dict({"text": f"page_{page_id}_highlight_2"}),
         ],
     )
 
@@ -50,6 +58,11 @@ def remarkable_raw_content() -> RawFile:
     return raw_highlight
 
 
+@pytest.fixture
+def remarkable_document_content() -> DocumentContent:
+    return DocumentContent(remarkable_raw_content())
+
+
 @pytest.fixture
 def remarkable_document_with_2_page_highlights(
     make_remarkable_raw_highlights: Callable[[int], RawHighlightFile],
@@ -79,3 +92,65 @@ def remarkable_document_with_2_page_highlights(
     )
     document_metadata = DocumentMetadata(RawFile(Path("doc_id.metadata"), {"visibleName": "doc"}))
     return Document(document_highlights, document_metadata)
+
+
+def write_json(path: Path, content: dict) -> None:
+    path.write_text(json.dumps(content), encoding="utf-8")
+
+
+@pytest.fixture
+def write_page_highlights() -> Callable[[Path, str, str, str], None]:
+    def _write_page_highlights(
+        data_folder: Path, document_id: str, page_id: str, text: str
+    ) -> None:
+        rect = {"x": 100, "y": 200, "width": 600, "height": 40}
+        highlight = {"text": text, "rects": [rect], "color": 1, "start": 0, "length": len(text)}
+        (data_folder / f"{document_id}.highlights").mkdir(parents=True, exist_ok=True)
+        write_json(
+            data_folder / f"{document_id}.highlights/{page_id}.json",
+            {"highlights": [[highlight]]},
+        )
+
+    return _write_page_highlights
+
+
+@pytest.fixture
+def make_xochitl_document(
+    write_page_highlights: Callable[[Path, str, str, str], None]
+) -> Callable[[Path, str, str, bool], None]:
+    def _make_xochitl_document(
+        data_folder: Path, document_id: str, document_name: str, with_table_of_contents: bool
+    ) -> None:
+        data_folder.mkdir(parents=True, exist_ok=True)
+        pdf = fitz.open()
+        for _ in range(len(XOCHITL_PAGE_IDS) + 1):
+            pdf.new_page()
+        if with_table_of_contents:
+            pdf.set_toc([[1, "chapter_1", 1], [1, "chapter_2", 2]])
+        pdf.save(data_folder / f"{document_id}.pdf")
+        write_json(data_folder / f"{document_id}.metadata", {"visibleName": document_name})
+        write_json(
+            data_folder / f"{document_id}.content",
+            {"pages": XOCHITL_PAGE_IDS, "redirectionPageMap": [1, 2, 3], "FileType": "pdf"},
+        )
+        for page_id in XOCHITL_PAGE_IDS[:2]:
+            write_page_highlights(data_folder, document_id, page_id, f"{page_id}_highlight")
+
+    return _make_xochitl_document
+
+
+@pytest.fixture
+def xochitl_folder(
+    tmp_path: Path, make_xochitl_document: Callable[[Path, str, str, bool], None]
+) -> Path:
+    """Xochitl folder with one PDF document named "book", highlighted on its first two pages."""
+    data_folder = tmp_path / "xochitl"
+    make_xochitl_document(data_folder, XOCHITL_DOCUMENT_ID, "book", True)
+    return data_folder
+
+
+@pytest.fixture
+def vault_path(tmp_path: Path) -> Path:
+    vault_path = tmp_path / "vault"
+    vault_path.mkdir()
+    return vault_path
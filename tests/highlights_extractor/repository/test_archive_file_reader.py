@@ -0,0 +1,97 @@
+# pylint: disable=protected-access, redefined-outer-name
+import shutil
+from pathlib import Path
+
+import pytest
+
+from highlights_extractor.model_utils import (
+    ExtractionResources,
+    get_document_highlights,
+)
+from highlights_extractor.models import DocumentMetadata
+from highlights_extractor.pdf_document_pool import PDFDocumentPool
+from highlights_extractor.repository.archive_file_reader import ArchiveFileReader
+from highlights_extractor.repository.file_reader import LocalFileReader
+from tests.constants import XOCHITL_DOCUMENT_ID
+
+
+@pytest.fixture(params=["zip", "tar", "gztar", "bztar", "xztar"])
+def archive_path(request: pytest.FixtureRequest, tmp_path: Path, xochitl_folder: Path) -> Path:
+    return Path(
+        shutil.make_archive(
+            str(tmp_path / "backup"),
+            request.param,
+            root_dir=xochitl_folder.parent,
+            base_dir=xochitl_folder.name,
+        )
+    )
+
+
+def test_archive_file_reader_reads_the_same_files_as_the_local_file_reader(
+    archive_path: Path, xochitl_folder: Path
+) -> None:
+    with ArchiveFileReader(archive_path) as archive_fs:
+        archive_metadata_files = archive_fs.read_all_metadata_files(["visibleName"])
+        archive_content = archive_fs.read_document_content(XOCHITL_DOCUMENT_ID).content
+        archive_highlight_files = archive_fs.read_document_highlights(XOCHITL_DOCUMENT_ID)
+    local_fs = LocalFileReader(xochitl_folder)
+
+    assert [(raw_file.document_id, raw_file.content) for raw_file in archive_metadata_files] == [
+        (XOCHITL_DOCUMENT_ID, {"visibleName": "book"})
+    ]
+    assert archive_content == local_fs.read_document_content(XOCHITL_DOCUMENT_ID).content
+    assert sorted(
+        (highlight_file.page_id, highlight_file.content)
+        for highlight_file in archive_highlight_files
+    ) == sorted(
+        (highlight_file.page_id, highlight_file.content)
+        for highlight_file in local_fs.read_document_highlights(XOCHITL_DOCUMENT_ID)
+    )
+
+
+def test_archive_file_reader_reads_pdfs_in_memory(
+    archive_path: Path, xochitl_folder: Path
+) -> None:
+    with ArchiveFileReader(archive_path) as archive_fs:
+        assert archive_fs.has_document_pdf(XOCHITL_DOCUMENT_ID)
+        assert not archive_fs.has_document_pdf("unknown_id")
+        assert (
+            archive_fs.read_document_pdf_stream(XOCHITL_DOCUMENT_ID)
+            == (xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.pdf").read_bytes()
+        )
+        assert all(archive_fs.get_document_files_mtimes(XOCHITL_DOCUMENT_ID))
+        with pytest.raises(FileNotFoundError):
+            archive_fs.read_document_pdf_stream("unknown_id")
+
+
+def test_get_document_highlights_from_an_archive(archive_path: Path) -> None:
+    document_pool = PDFDocumentPool()
+
+    with ArchiveFileReader(archive_path) as archive_fs:
+        document_metadata = DocumentMetadata(
+            archive_fs.read_all_metadata_files(["visibleName"])[0]
+        )
+        for _ in range(2):
+            document_highlights = get_document_highlights(
+                archive_fs,
+                document_metadata,
+                is_saving_images=False,
+                resources=ExtractionResources(document_pool=document_pool),
+            )
+
+    assert [chapter.chapter for chapter in document_highlights] == ["chapter_1", "chapter_2"]
+    assert (document_pool.stats.hits, document_pool.stats.misses) == (1, 1)
+
+
+def test_close_removes_the_decompressed_tar(tmp_path: Path, xochitl_folder: Path) -> None:
+    archive_path = shutil.make_archive(
+        str(tmp_path / "backup"),
+        "gztar",
+        root_dir=xochitl_folder.parent,
+        base_dir=xochitl_folder.name,
+    )
+
+    with ArchiveFileReader(Path(archive_path)) as archive_fs:
+        uncompressed_file = archive_fs._uncompressed_file
+
+    assert uncompressed_file is not None and uncompressed_file.closed
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from highlights_extractor.repository.file_reader import Highlights, LocalFileReader
+from tests.constants import XOCHITL_DOCUMENT_ID
+
+
+@pytest.mark.parametrize("max_workers", [1, 2, 8])
+def test_iter_document_highlights_yields_every_highlight_file(
+    xochitl_folder: Path,
+    write_page_highlights: Callable[[Path, str, str, str], None],
+    max_workers: int,
+) -> None:
+    for page_index in range(10):
+        write_page_highlights(
+            xochitl_folder, XOCHITL_DOCUMENT_ID, f"page_{page_index}", f"text_{page_index}"
+        )
+    local_fs = LocalFileReader(xochitl_folder)
+
+    streamed_files = list(local_fs.iter_document_highlights(XOCHITL_DOCUMENT_ID, max_workers))
+
+    assert len(streamed_files) == 12
+    assert sorted(streamed_files, key=lambda file: file.page_id) == sorted(
+        local_fs.read_document_highlights(XOCHITL_DOCUMENT_ID), key=lambda file: file.page_id
+    )
+
+
+def test_iter_document_highlights_raises_read_errors(xochitl_folder: Path) -> None:
+    (xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.highlights/broken.json").write_text("{")
+    local_fs = LocalFileReader(xochitl_folder)
+
+    with pytest.raises(ValueError):
+        list(local_fs.iter_document_highlights(XOCHITL_DOCUMENT_ID))
+
+
+def test_read_document_highlights_keeps_only_the_used_fields(xochitl_folder: Path) -> None:
+    highlights_path = xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.highlights/page.json"
+    rect = {"x": 1, "y": 2, "width": 3, "height": 4}
+    highlight = {"text": "text", "rects": [rect], "color": 3, "start": 5, "length": 4}
+    highlights_path.write_text(
+        json.dumps({"highlights": [[{**highlight, "extra": "x" * 100}], [[highlight]]]})
+    )
+    local_fs = LocalFileReader(xochitl_folder)
+
+    highlight_file = next(
+        highlight_file
+        for highlight_file in local_fs.read_document_highlights(XOCHITL_DOCUMENT_ID)
+        if highlight_file.page_id == "page"
+    )
+
+    assert highlight_file.content == [Highlights(3, 4, ((1, 2, 3, 4),), 5, "text")] * 2
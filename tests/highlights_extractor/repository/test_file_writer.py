@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+from highlights_extractor.repository.file_writer import AtomicFileWriter, WriteStats
+
+
+def test_write_text_chunks_skips_unchanged_files(tmp_path: Path) -> None:
+    file_path = tmp_path / "doc.md"
+    file_writer = AtomicFileWriter()
+    assert file_writer.write_text_chunks(file_path, ["# doc", "\nquote"])
+    os.utime(file_path, ns=(1, 1))
+
+    assert not file_writer.write_text_chunks(file_path, ["# doc\n", "quote"])
+
+    assert file_path.stat().st_mtime_ns == 1
+    assert file_writer.stats == WriteStats(written=1, skipped=1)
+    assert [path.name for path in tmp_path.iterdir()] == ["doc.md"]
+
+
+def test_write_text_chunks_replaces_changed_files(tmp_path: Path) -> None:
+    file_path = tmp_path / "doc.md"
+    file_writer = AtomicFileWriter()
+    file_writer.write_text_chunks(file_path, ["# doc"])
+
+    assert file_writer.write_text_chunks(file_path, ["# dot"])
+
+    assert file_path.read_text(encoding="utf-8") == "# dot"
+    assert file_writer.stats == WriteStats(written=2, skipped=0)
+
+
+def test_replace_if_changed_moves_the_temporary_file(tmp_path: Path) -> None:
+    file_path = tmp_path / "doc_1.jpeg"
+    file_writer = AtomicFileWriter()
+    temporary_path = file_writer.get_temporary_path(file_path)
+    temporary_path.write_bytes(b"image")
+
+    assert file_writer.replace_if_changed(temporary_path, file_path)
+
+    assert file_path.read_bytes() == b"image"
+    assert not temporary_path.exists()
@@ -0,0 +1,98 @@
+# pylint: disable=redefined-outer-name
+from pathlib import Path
+
+import pytest
+
+from highlights_extractor.models import ImageExportOptions, ImageFormat
+from highlights_extractor.repository.file_reader import Highlights
+from highlights_extractor.repository.image_cache import PageImageCache
+
+
+@pytest.fixture
+def image_file(tmp_path: Path) -> Path:
+    file_path = tmp_path / "image.jpeg"
+    file_path.write_bytes(b"0123456789")
+    return file_path
+
+
+def make_key(page_number: int, rects: list[dict]) -> str:
+    return PageImageCache.make_key(
+        "doc_id.pdf:100:1",
+        page_number,
+        [Highlights.from_dict({"text": "text", "rects": rects})],
+        1,
+        ImageExportOptions(),
+    )
+
+
+def test_make_key_changes_with_the_highlights_rects() -> None:
+    rect = {"x": 1, "y": 2, "width": 3, "height": 4}
+    assert make_key(1, [rect]) == make_key(1, [dict(rect)])
+    assert make_key(1, [rect]) != make_key(1, [{**rect, "width": 5}])
+    assert make_key(1, [rect]) != make_key(2, [rect])
+
+
+def test_make_key_changes_with_the_export_options() -> None:
+    highlight_contents = [Highlights.from_dict({"text": "text"})]
+    jpeg_key = PageImageCache.make_key("pdf", 1, highlight_contents, 1, ImageExportOptions())
+    png_key = PageImageCache.make_key(
+        "pdf", 1, highlight_contents, 1, ImageExportOptions(ImageFormat.PNG)
+    )
+    assert jpeg_key != png_key
+    clipped_key = PageImageCache.make_key(
+        "pdf", 1, highlight_contents, 1, ImageExportOptions(clip_padding=10)
+    )
+    assert clipped_key not in (jpeg_key, png_key)
+
+
+def test_get_and_put(tmp_path: Path, image_file: Path) -> None:
+    image_cache = PageImageCache(tmp_path / "cache")
+    copied_file = tmp_path / "copied.jpeg"
+
+    assert not image_cache.get("key", copied_file)
+    image_cache.put("key", image_file)
+    assert image_cache.get("key", copied_file)
+
+    assert copied_file.read_bytes() == image_file.read_bytes()
+    assert (image_cache.stats.hits, image_cache.stats.misses) == (1, 1)
+
+
+def test_cache_is_persisted_on_disk(tmp_path: Path, image_file: Path) -> None:
+    PageImageCache(tmp_path / "cache").put("key", image_file)
+
+    assert PageImageCache(tmp_path / "cache").get("key", tmp_path / "copied.jpeg")
+
+
+def test_least_recently_used_images_are_evicted(tmp_path: Path, image_file: Path) -> None:
+    image_cache = PageImageCache(tmp_path / "cache", max_size_bytes=25)
+    image_cache.put("key_1", image_file)
+    image_cache.put("key_2", image_file)
+    image_cache.get("key_1", tmp_path / "copied.jpeg")
+    image_cache.put("key_3", image_file)
+
+    assert not image_cache.get("key_2", tmp_path / "copied.jpeg")
+    assert image_cache.get("key_1", tmp_path / "copied.jpeg")
+    assert image_cache.get("key_3", tmp_path / "copied.jpeg")
+    assert image_cache.size_bytes == 20
+    assert image_cache.stats.evictions == 1
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["key_1", "key_3"]
+
+
+def test_get_an_image_evicted_by_another_cache_is_a_miss(tmp_path: Path, image_file: Path) -> None:
+    evicting_cache = PageImageCache(tmp_path / "cache", max_size_bytes=15)
+    evicting_cache.put("key_1", image_file)
+    stale_cache = PageImageCache(tmp_path / "cache", max_size_bytes=15)
+    evicting_cache.put("key_2", image_file)
+
+    assert not stale_cache.get("key_1", tmp_path / "copied.jpeg")
+
+    assert stale_cache.size_bytes == 0
+    assert (stale_cache.stats.hits, stale_cache.stats.misses) == (0, 1)
+
+
+def test_put_the_same_key_again_counts_its_size_once(tmp_path: Path, image_file: Path) -> None:
+    image_cache = PageImageCache(tmp_path / "cache")
+    image_cache.put("key", image_file)
+    image_cache.put("key", image_file)
+
+    assert image_cache.size_bytes == 10
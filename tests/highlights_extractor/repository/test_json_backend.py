@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from highlights_extractor.repository import json_backend
+from highlights_extractor.repository.json_backend import (
+    JSON_BACKENDS,
+    STDLIB_JSON_BACKEND,
+    get_json_backend,
+    read_json_file,
+)
+
+JSON_CONTENT = {"visibleName": "bôok", "pages": ["page_id_0", "page_id_1"], "lastOpenedPage": 1}
+
+
+@pytest.mark.parametrize("backend_name", list(JSON_BACKENDS))
+@pytest.mark.parametrize("mmap_min_size_bytes", [0, json_backend.MMAP_MIN_SIZE_BYTES])
+def test_read_json_file_parses_the_same_content_with_every_backend(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    backend_name: str,
+    mmap_min_size_bytes: int,
+) -> None:
+    monkeypatch.setattr(json_backend, "MMAP_MIN_SIZE_BYTES", mmap_min_size_bytes)
+    json_path = tmp_path / "document.content"
+    json_path.write_text(
+        '{"visibleName": "bôok", "pages": ["page_id_0", "page_id_1"], "lastOpenedPage": 1}',
+        encoding="utf-8",
+    )
+
+    assert read_json_file(json_path, get_json_backend(backend_name)) == JSON_CONTENT
+
+
+def test_get_json_backend_prefers_orjson_when_installed() -> None:
+    expected_backend_name = "orjson" if "orjson" in JSON_BACKENDS else "json"
+    assert get_json_backend().name == expected_backend_name
+    assert get_json_backend("json") == STDLIB_JSON_BACKEND
+
+
+def test_get_json_backend_raises_error_for_unknown_backend() -> None:
+    with pytest.raises(ValueError, match="simdjson"):
+        get_json_backend("simdjson")
@@ -1,9 +1,17 @@
 # pylint: disable=protected-access, redefined-outer-name
 from pathlib import Path
+from typing import Callable, Iterator, Sequence
 
 import pytest
-
-from highlights_extractor.models import Document
+from PIL import Image
+
+from highlights_extractor.models import (
+    Document,
+    ImageExportOptions,
+    ImageFormat,
+    PageImage,
+)
+from highlights_extractor.repository.file_reader import RawHighlightFile
 from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
 
 
@@ -50,3 +58,90 @@ def test_format_document(
         remarkable_document_with_2_page_highlights
     )
     assert expected_formatted_document == actual_document_formatted_content
+
+
+def test_extract_document_writes_the_formatted_document(
+    tmp_path: Path, remarkable_document_with_2_page_highlights: Document
+) -> None:
+    obsidian_document = ObsidianDocument(tmp_path, tmp_path)
+
+    obsidian_document.extract_document(remarkable_document_with_2_page_highlights)
+
+    assert (tmp_path / "doc.md").read_bytes() == obsidian_document.format_document(
+        remarkable_document_with_2_page_highlights
+    ).encode("utf-8")
+
+
+class FakePageRenderer:
+    def __init__(self) -> None:
+        self.rendered_pages: list[int] = []
+
+    def get_page_image(
+        self, page_number: int, _highlight_file: RawHighlightFile, image_zoom: int
+    ) -> Image.Image:
+        self.rendered_pages.append(page_number)
+        return Image.new("RGB", (10 * image_zoom, 10 * image_zoom))
+
+    def save_pages_images(
+        self,
+        pages: Sequence[tuple[int, RawHighlightFile, Path]],
+        image_zoom: int,
+        export_options: ImageExportOptions,
+        _render_processes: int,
+    ) -> Iterator[Path]:
+        for page_number, highlight_file, file_path in pages:
+            image = self.get_page_image(page_number, highlight_file, image_zoom)
+            image.save(file_path, format=export_options.image_format.name)
+            yield file_path
+
+
+@pytest.fixture
+def page_renderer(
+    remarkable_document_with_2_page_highlights: Document,
+    make_remarkable_raw_highlights: Callable[[int], RawHighlightFile],
+) -> FakePageRenderer:
+    renderer = FakePageRenderer()
+    for chapter_highlights in remarkable_document_with_2_page_highlights:
+        for page_highlights in chapter_highlights:
+            page_highlights.image = PageImage(
+                renderer,
+                page_highlights.page_number,
+                make_remarkable_raw_highlights(page_highlights.page_number),
+            )
+    return renderer
+
+
+def test_extract_document_renders_page_images_only_when_saving_them(
+    tmp_path: Path,
+    remarkable_document_with_2_page_highlights: Document,
+    page_renderer: FakePageRenderer,
+) -> None:
+    assert not page_renderer.rendered_pages
+
+    ObsidianDocument(tmp_path, tmp_path, is_saving_images=True).extract_document(
+        remarkable_document_with_2_page_highlights
+    )
+
+    assert page_renderer.rendered_pages == [1, 2, 3, 4]
+    assert sorted(path.name for path in tmp_path.glob("*.jpeg")) == [
+        f"doc_{page_number}.jpeg" for page_number in range(1, 5)
+    ]
+
+
+@pytest.mark.usefixtures("page_renderer")
+def test_extract_document_with_png_images(
+    tmp_path: Path, remarkable_document_with_2_page_highlights: Document
+) -> None:
+    obsidian_document = ObsidianDocument(
+        tmp_path,
+        tmp_path,
+        is_saving_images=True,
+        image_export_options=ImageExportOptions(ImageFormat.PNG),
+    )
+
+    obsidian_document.extract_document(remarkable_document_with_2_page_highlights)
+
+    assert "![[doc_1.png]]" in (tmp_path / "doc.md").read_text(encoding="utf-8")
+    assert sorted(path.name for path in tmp_path.glob("*.png")) == [
+        f"doc_{page_number}.png" for page_number in range(1, 5)
+    ]
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+from typing import Callable
+
+from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.metadata_catalog import MetadataCatalog
+from tests.constants import XOCHITL_DOCUMENT_ID
+
+
+def test_refresh_parses_only_new_and_changed_metadata_files(
+    tmp_path: Path,
+    xochitl_folder: Path,
+    make_xochitl_document: Callable[[Path, str, str, bool], None],
+) -> None:
+    metadata_catalog = MetadataCatalog(tmp_path / "catalog.sqlite3")
+    local_fs = LocalFileReader(xochitl_folder)
+    assert metadata_catalog.refresh(xochitl_folder, local_fs.read_json) == 1
+    assert metadata_catalog.refresh(xochitl_folder, local_fs.read_json) == 0
+
+    make_xochitl_document(xochitl_folder, "other_document_id", "other_book", True)
+    assert metadata_catalog.refresh(xochitl_folder, local_fs.read_json) == 1
+
+    metadata_path = xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.metadata"
+    metadata_path.write_text(json.dumps({"visibleName": "renamed book"}), encoding="utf-8")
+    assert metadata_catalog.refresh(xochitl_folder, local_fs.read_json) == 1
+    assert metadata_catalog.read_all_metadata(["visibleName"]) == [
+        (XOCHITL_DOCUMENT_ID, {"visibleName": "renamed book"}),
+        ("other_document_id", {"visibleName": "other_book"}),
+    ]
+
+
+def test_refresh_removes_deleted_documents(tmp_path: Path, xochitl_folder: Path) -> None:
+    metadata_catalog = MetadataCatalog(tmp_path / "catalog.sqlite3")
+    local_fs = LocalFileReader(xochitl_folder)
+    metadata_catalog.refresh(xochitl_folder, local_fs.read_json)
+    (xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.metadata").unlink()
+
+    metadata_catalog.refresh(xochitl_folder, local_fs.read_json)
+
+    assert not metadata_catalog.read_all_metadata(["visibleName"])
+
+
+def test_read_all_metadata_with_fields_without_column(xochitl_folder: Path) -> None:
+    metadata_path = xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.metadata"
+    metadata_path.write_text(
+        json.dumps({"visibleName": "book", "lastModified": "1670000000000"}), encoding="utf-8"
+    )
+    metadata_catalog = MetadataCatalog(":memory:")
+    metadata_catalog.refresh(xochitl_folder, LocalFileReader(xochitl_folder).read_json)
+
+    assert metadata_catalog.read_all_metadata(["lastModified", "visibleName"]) == [
+        (XOCHITL_DOCUMENT_ID, {"lastModified": "1670000000000", "visibleName": "book"})
+    ]
+
+
+def test_local_file_reader_reads_the_metadata_from_the_catalog(
+    tmp_path: Path, xochitl_folder: Path
+) -> None:
+    local_fs = LocalFileReader(xochitl_folder)
+    catalog_local_fs = LocalFileReader(
+        xochitl_folder, metadata_catalog=MetadataCatalog(tmp_path / "catalog.sqlite3")
+    )
+
+    assert [
+        (raw_file.file_path, raw_file.content)
+        for raw_file in catalog_local_fs.read_all_metadata_files(["visibleName"])
+    ] == [
+        (raw_file.file_path, raw_file.content)
+        for raw_file in local_fs.read_all_metadata_files(["visibleName"])
+    ]
@@ -0,0 +1,208 @@
+import json
+import os
+import pstats
+import shutil
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from highlights_extractor import cli
+from highlights_extractor.cli import export_library, main
+from highlights_extractor.library_watcher import LibraryWatcher
+from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
+from tests.constants import XOCHITL_DOCUMENT_ID
+
+
+def test_export_library_skips_and_records_not_processable_documents(
+    xochitl_folder: Path,
+    vault_path: Path,
+    make_xochitl_document: Callable[[Path, str, str, bool], None],
+) -> None:
+    make_xochitl_document(xochitl_folder, "not_a_book_id", "not_a_book", False)
+    progress = []
+
+    results = export_library(
+        LocalFileReader(xochitl_folder),
+        ObsidianDocument(vault_path, vault_path),
+        document_workers=2,
+        on_progress=lambda finished, total, _: progress.append((finished, total)),
+    )
+
+    results_per_document = {result.document_id: result for result in results}
+    assert results_per_document[XOCHITL_DOCUMENT_ID].error is None
+    assert results_per_document[XOCHITL_DOCUMENT_ID].exported_pages == 2
+    assert results_per_document["not_a_book_id"].error is not None
+    assert progress == [(1, 2), (2, 2)]
+    assert [path.name for path in vault_path.iterdir()] == ["book.md"]
+
+
+def test_main_records_documents_failing_to_export_and_exports_the_others(
+    xochitl_folder: Path,
+    vault_path: Path,
+    make_xochitl_document: Callable[[Path, str, str, bool], None],
+    capsys: pytest.CaptureFixture,
+) -> None:
+    make_xochitl_document(xochitl_folder, "broken_book_id", "broken_book", True)
+    (xochitl_folder / "broken_book_id.pdf").write_bytes(b"not a pdf")
+
+    exit_code = main([str(vault_path), "--data-folder", str(xochitl_folder), "--no-image-cache"])
+
+    assert exit_code == 0
+    assert "broken_book (broken_book_id)" in capsys.readouterr().out
+    assert [path.name for path in vault_path.iterdir()] == ["book.md"]
+
+
+def test_main(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    exit_code = main(
+        [
+            str(vault_path),
+            "--data-folder",
+            str(xochitl_folder),
+            "--images",
+            "--image-format",
+            "png",
+            "--images-path",
+            str(tmp_path),
+            "--no-image-cache",
+        ]
+    )
+
+    assert exit_code == 0
+    assert "Exported 1 documents and 2 pages" in capsys.readouterr().out
+    assert (vault_path / "book.md").exists()
+    assert sorted(path.name for path in tmp_path.glob("*.png")) == ["book_1.png", "book_2.png"]
+
+
+def test_main_does_not_rewrite_unchanged_files(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    arguments = [
+        str(vault_path),
+        "--data-folder",
+        str(xochitl_folder),
+        "--images",
+        "--images-path",
+        str(tmp_path),
+        "--no-image-cache",
+    ]
+    main(arguments)
+    os.utime(vault_path / "book.md", ns=(1, 1))
+    capsys.readouterr()
+
+    main(arguments)
+
+    assert "Wrote 0 files, skipped 3 unchanged files" in capsys.readouterr().out
+    assert (vault_path / "book.md").stat().st_mtime_ns == 1
+
+
+def test_main_saves_the_trace_and_profile_of_the_export(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    main(
+        [
+            str(vault_path),
+            "--data-folder",
+            str(xochitl_folder),
+            "--images",
+            "--images-path",
+            str(tmp_path),
+            "--no-image-cache",
+            "--trace",
+            str(tmp_path / "trace.json"),
+            "--profile",
+            str(tmp_path / "export.prof"),
+        ]
+    )
+
+    document_stages = json.loads((tmp_path / "trace.json").read_text(encoding="utf-8"))[
+        "documents"
+    ][XOCHITL_DOCUMENT_ID]
+    assert {
+        "read_files",
+        "get_page_number",
+        "get_chapter_titles",
+        "render_page",
+        "encode_image",
+        "write_markdown",
+    } <= set(document_stages)
+    assert document_stages["get_page_number"]["calls"] == 2
+    assert document_stages["write_markdown"]["bytes_written"] > 0
+    assert pstats.Stats(str(tmp_path / "export.prof")).get_stats_profile().func_profiles
+    assert "Stages:" in capsys.readouterr().out
+
+
+def test_main_exports_an_archive_like_its_folder(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path
+) -> None:
+    archive_path = shutil.make_archive(
+        str(tmp_path / "backup"), "gztar", root_dir=tmp_path, base_dir="xochitl"
+    )
+    archive_vault_path = tmp_path / "archive_vault"
+    archive_vault_path.mkdir()
+
+    main([str(vault_path), "--data-folder", str(xochitl_folder), "--no-image-cache"])
+    main([str(archive_vault_path), "--data-folder", archive_path, "--no-image-cache"])
+
+    assert (archive_vault_path / "book.md").read_text() == (vault_path / "book.md").read_text()
+    with pytest.raises(SystemExit):
+        main([str(vault_path), "--data-folder", archive_path, "--incremental"])
+
+
+def test_export_library_exports_only_the_given_documents(
+    xochitl_folder: Path,
+    vault_path: Path,
+    make_xochitl_document: Callable[[Path, str, str, bool], None],
+) -> None:
+    make_xochitl_document(xochitl_folder, "other_book_id", "other_book", True)
+
+    results = export_library(
+        LocalFileReader(xochitl_folder),
+        ObsidianDocument(vault_path, vault_path),
+        document_ids=["other_book_id"],
+    )
+
+    assert [result.document_id for result in results] == ["other_book_id"]
+    assert [path.name for path in vault_path.iterdir()] == ["other_book.md"]
+
+
+def test_main_watch_retries_only_the_documents_failing_to_export(
+    xochitl_folder: Path,
+    vault_path: Path,
+    make_xochitl_document: Callable[[Path, str, str, bool], None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    retried_document_ids = []
+
+    def watch_library(
+        watcher: LibraryWatcher, export_documents: Callable[[set[str]], None], *_: object
+    ) -> None:
+        make_xochitl_document(xochitl_folder, "broken_book_id", "broken_book", True)
+        (xochitl_folder / "broken_book_id.pdf").write_bytes(b"not a pdf")
+        (xochitl_folder / "incomplete_book_id.metadata").write_text("{", encoding="utf-8")
+        (vault_path / "book.md").unlink()
+        # the files written above are polled first, so the next batch only has the retries
+        watcher.poll()
+        export_documents({XOCHITL_DOCUMENT_ID, "broken_book_id", "incomplete_book_id"})
+        retried_document_ids.append(watcher.poll())
+
+    monkeypatch.setattr(cli, "watch_library", watch_library)
+
+    exit_code = main(
+        [
+            str(vault_path),
+            "--data-folder",
+            str(xochitl_folder),
+            "--no-image-cache",
+            "--watch",
+            "--debounce",
+            "0",
+        ]
+    )
+
+    assert exit_code == 0
+    assert (vault_path / "book.md").exists()
+    assert retried_document_ids == [{"broken_book_id", "incomplete_book_id"}]
@@ -0,0 +1,101 @@
+import os
+from pathlib import Path
+from typing import Callable
+
+from highlights_extractor.extraction_cache import ExtractionCache
+from highlights_extractor.models import DocumentMetadata
+from highlights_extractor.repository.file_reader import LocalFileReader, RawFile
+from tests.constants import XOCHITL_DOCUMENT_ID, XOCHITL_PAGE_IDS
+
+
+def make_document_metadata(document_id: str, document_name: str) -> DocumentMetadata:
+    return DocumentMetadata(
+        RawFile(Path(f"{document_id}.metadata"), {"visibleName": document_name})
+    )
+
+
+def test_get_document_highlights_returns_cached_document(xochitl_folder: Path) -> None:
+    local_fs = LocalFileReader(xochitl_folder)
+    document_metadata = make_document_metadata(XOCHITL_DOCUMENT_ID, "book")
+    extraction_cache = ExtractionCache()
+
+    first_highlights = extraction_cache.get_document_highlights(local_fs, document_metadata, False)
+    second_highlights = extraction_cache.get_document_highlights(
+        local_fs, document_metadata, False
+    )
+
+    assert second_highlights is first_highlights
+    assert (extraction_cache.stats.hits, extraction_cache.stats.misses) == (1, 1)
+
+
+def test_get_document_highlights_extracts_again_changed_document(
+    xochitl_folder: Path, write_page_highlights: Callable[[Path, str, str, str], None]
+) -> None:
+    local_fs = LocalFileReader(xochitl_folder)
+    document_metadata = make_document_metadata(XOCHITL_DOCUMENT_ID, "book")
+    extraction_cache = ExtractionCache()
+    first_highlights = extraction_cache.get_document_highlights(local_fs, document_metadata, False)
+
+    write_page_highlights(xochitl_folder, XOCHITL_DOCUMENT_ID, XOCHITL_PAGE_IDS[0], "new")
+    highlight_path = (
+        xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.highlights/{XOCHITL_PAGE_IDS[0]}.json"
+    )
+    os.utime(highlight_path, ns=(1, 1))
+    second_highlights = extraction_cache.get_document_highlights(
+        local_fs, document_metadata, False
+    )
+
+    assert second_highlights is not first_highlights
+    assert second_highlights.chapters_highlights[0].page_highlights[0].highlights == ["new"]
+
+
+def test_get_document_highlights_caches_with_and_without_images_separately(
+    xochitl_folder: Path,
+) -> None:
+    local_fs = LocalFileReader(xochitl_folder)
+    document_metadata = make_document_metadata(XOCHITL_DOCUMENT_ID, "book")
+    extraction_cache = ExtractionCache()
+
+    highlights_without_images = extraction_cache.get_document_highlights(
+        local_fs, document_metadata, False
+    )
+    highlights_with_images = extraction_cache.get_document_highlights(
+        local_fs, document_metadata, True
+    )
+
+    assert highlights_with_images is not highlights_without_images
+    assert highlights_with_images.chapters_highlights[0].page_highlights[0].image
+
+
+def test_get_document_highlights_evicts_least_recently_used_document(
+    tmp_path: Path, make_xochitl_document: Callable[[Path, str, str, bool], None]
+) -> None:
+    data_folder = tmp_path / "xochitl"
+    for document_id in ["document_0", "document_1"]:
+        make_xochitl_document(data_folder, document_id, document_id, True)
+    local_fs = LocalFileReader(data_folder)
+    first_metadata = make_document_metadata("document_0", "document_0")
+    second_metadata = make_document_metadata("document_1", "document_1")
+    extraction_cache = ExtractionCache(max_documents=1)
+
+    extraction_cache.get_document_highlights(local_fs, first_metadata, False)
+    extraction_cache.get_document_highlights(local_fs, second_metadata, False)
+    extraction_cache.get_document_highlights(local_fs, first_metadata, False)
+
+    assert (extraction_cache.stats.misses, extraction_cache.stats.evictions) == (3, 2)
+
+
+def test_get_document_highlights_falls_back_on_parent_cache(xochitl_folder: Path) -> None:
+    local_fs = LocalFileReader(xochitl_folder)
+    document_metadata = make_document_metadata(XOCHITL_DOCUMENT_ID, "book")
+    process_cache = ExtractionCache()
+    first_highlights = ExtractionCache(parent=process_cache).get_document_highlights(
+        local_fs, document_metadata, False
+    )
+
+    second_highlights = ExtractionCache(parent=process_cache).get_document_highlights(
+        local_fs, document_metadata, False
+    )
+
+    assert second_highlights is first_highlights
+    assert process_cache.stats.hits == 1
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["fitz", "numpy", "pandas", "PIL", "pymupdf"]
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "highlights_extractor.cli",
+        "highlights_extractor.extraction_cache",
+        "highlights_extractor.library_sync",
+        "highlights_extractor.model_utils",
+        "highlights_extractor.repository.file_reader",
+        "highlights_extractor.repository.knowledge_manager_writer",
+    ],
+)
+def test_import_does_not_load_pdf_and_image_libraries(module: str) -> None:
+    """The libraries to read PDFs and images are slow to import, they must only be loaded
+    once a PDF is read, so that short-lived commands start fast."""
+    loaded_modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(' '.join(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+
+    assert not set(HEAVY_MODULES) & set(loaded_modules)
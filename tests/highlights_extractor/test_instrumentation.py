@@ -0,0 +1,34 @@
+from highlights_extractor.instrumentation import (
+    PipelineTrace,
+    StageStats,
+    record_bytes,
+    stage,
+    trace_document,
+)
+
+
+def test_stage_is_recorded_only_in_a_traced_document() -> None:
+    trace = PipelineTrace()
+
+    with stage("read_files"):
+        pass
+    with trace_document(trace, "doc_id"):
+        with stage("read_files"):
+            record_bytes("read_files", bytes_read=10)
+        with stage("read_files"):
+            pass
+
+    read_files_stats = trace.documents_stages["doc_id"]["read_files"]
+    assert (read_files_stats.calls, read_files_stats.bytes_read) == (2, 10)
+    assert list(trace.documents_stages) == ["doc_id"]
+
+
+def test_get_total_stages_adds_up_the_stages_of_all_documents() -> None:
+    trace = PipelineTrace()
+    trace.record("doc_1", "write_markdown", StageStats(seconds=1.0, calls=1, bytes_written=5))
+    trace.record("doc_2", "write_markdown", StageStats(seconds=2.0, calls=1, bytes_written=7))
+
+    assert trace.get_total_stages() == {
+        "write_markdown": StageStats(seconds=3.0, calls=2, bytes_written=12)
+    }
+    assert trace.to_dict()["total"]["write_markdown"]["calls"] == 2
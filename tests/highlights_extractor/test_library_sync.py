@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import Callable
+
+from highlights_extractor.library_sync import SyncManifest, SyncReport, sync_library
+from highlights_extractor.repository.file_reader import LocalFileReader
+from highlights_extractor.repository.knowledge_manager_writer import ObsidianDocument
+from tests.constants import XOCHITL_DOCUMENT_ID
+
+
+def sync(data_folder: Path, vault_path: Path, manifest_path: Path) -> SyncReport:
+    return sync_library(
+        LocalFileReader(data_folder),
+        ObsidianDocument(vault_path, vault_path, is_saving_images=True),
+        SyncManifest(manifest_path),
+    )
+
+
+def test_sync_library_exports_new_documents(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path
+) -> None:
+    report = sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    assert report.added == [XOCHITL_DOCUMENT_ID]
+    assert sorted(path.name for path in vault_path.iterdir()) == [
+        "book.md",
+        "book_1.jpeg",
+        "book_2.jpeg",
+    ]
+
+
+def test_sync_library_skips_unchanged_documents(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path
+) -> None:
+    sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+    (vault_path / "book.md").unlink()
+
+    report = sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    assert report.unchanged == [XOCHITL_DOCUMENT_ID]
+    assert not (vault_path / "book.md").exists()
+
+
+def test_sync_library_exports_only_the_changed_pages(
+    tmp_path: Path,
+    xochitl_folder: Path,
+    vault_path: Path,
+    write_page_highlights: Callable[[Path, str, str, str], None],
+) -> None:
+    sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+    (vault_path / "book_1.jpeg").unlink()
+    (vault_path / "book_2.jpeg").unlink()
+    write_page_highlights(xochitl_folder, XOCHITL_DOCUMENT_ID, "page_id_1", "new_highlight")
+    write_page_highlights(xochitl_folder, XOCHITL_DOCUMENT_ID, "page_id_2", "other_highlight")
+
+    report = sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    assert report.updated == [XOCHITL_DOCUMENT_ID]
+    assert sorted(path.name for path in vault_path.iterdir()) == [
+        "book.md",
+        "book_2.jpeg",
+        "book_3.jpeg",
+    ]
+    assert "new_highlight" in (vault_path / "book.md").read_text(encoding="utf-8")
+
+
+def test_sync_library_removes_the_files_of_deleted_documents(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path
+) -> None:
+    sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+    (xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.metadata").unlink()
+
+    report = sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    assert report.deleted == [XOCHITL_DOCUMENT_ID]
+    assert not list(vault_path.iterdir())
+    assert not SyncManifest(tmp_path / "manifest.json").documents
+
+
+def test_sync_library_exports_again_when_the_export_settings_change(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path
+) -> None:
+    sync_library(
+        LocalFileReader(xochitl_folder),
+        ObsidianDocument(vault_path, vault_path),
+        SyncManifest(tmp_path / "manifest.json"),
+    )
+
+    report = sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    assert report.updated == [XOCHITL_DOCUMENT_ID]
+    assert sorted(path.name for path in vault_path.iterdir()) == [
+        "book.md",
+        "book_1.jpeg",
+        "book_2.jpeg",
+    ]
+
+
+def test_sync_library_to_another_vault_exports_again_and_keeps_the_first_vault(
+    tmp_path: Path, xochitl_folder: Path, vault_path: Path
+) -> None:
+    other_vault_path = tmp_path / "other_vault"
+    other_vault_path.mkdir()
+    sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    report = sync(xochitl_folder, other_vault_path, tmp_path / "manifest.json")
+
+    assert report.updated == [XOCHITL_DOCUMENT_ID]
+    assert (other_vault_path / "book.md").exists()
+    assert (vault_path / "book.md").exists()
+
+
+def test_sync_library_records_broken_documents_and_syncs_the_others(
+    tmp_path: Path,
+    xochitl_folder: Path,
+    vault_path: Path,
+    make_xochitl_document: Callable[[Path, str, str, bool], None],
+) -> None:
+    make_xochitl_document(xochitl_folder, "broken_book_id", "broken_book", True)
+    (xochitl_folder / "broken_book_id.pdf").write_bytes(b"not a pdf")
+
+    report = sync(xochitl_folder, vault_path, tmp_path / "manifest.json")
+
+    assert report.added == [XOCHITL_DOCUMENT_ID]
+    assert list(report.failed) == ["broken_book_id"]
+    assert sync(xochitl_folder, vault_path, tmp_path / "manifest.json").unchanged == [
+        XOCHITL_DOCUMENT_ID
+    ]
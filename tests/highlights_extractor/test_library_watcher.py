@@ -0,0 +1,141 @@
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from highlights_extractor.library_watcher import (
+    LibraryWatcher,
+    WatchOptions,
+    get_changed_document_ids,
+    get_changed_files,
+    scan_library_files,
+    watch_library,
+)
+from tests.constants import XOCHITL_DOCUMENT_ID
+
+
+class FakeClock:
+    # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def touch(file_path: Path, mtime_ns: int) -> None:
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+
+def test_scan_library_files_scans_the_documents_and_highlight_files(
+    xochitl_folder: Path,
+) -> None:
+    (xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.thumbnails").mkdir()
+    (xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.thumbnails/page_id_0.jpg").write_bytes(b"")
+
+    assert sorted(scan_library_files(xochitl_folder)) == [
+        f"{XOCHITL_DOCUMENT_ID}.content",
+        f"{XOCHITL_DOCUMENT_ID}.highlights/page_id_0.json",
+        f"{XOCHITL_DOCUMENT_ID}.highlights/page_id_1.json",
+        f"{XOCHITL_DOCUMENT_ID}.metadata",
+        f"{XOCHITL_DOCUMENT_ID}.pdf",
+    ]
+
+
+def test_get_changed_document_ids_of_the_changed_files() -> None:
+    changed_files = get_changed_files(
+        {"doc_1.content": (1, 1), "doc_1.highlights/page_1.json": (1, 1), "doc_2.pdf": (1, 1)},
+        {
+            "doc_1.content": (1, 1),
+            "doc_1.highlights/page_1.json": (2, 1),
+            "doc_3.metadata": (1, 1),
+            "doc_3.local": (1, 1),
+        },
+    )
+
+    assert changed_files == {
+        "doc_1.highlights/page_1.json",
+        "doc_2.pdf",
+        "doc_3.metadata",
+        "doc_3.local",
+    }
+    assert get_changed_document_ids(changed_files) == {"doc_1", "doc_2", "doc_3"}
+
+
+def test_poll_gives_the_changes_once_they_settled(
+    xochitl_folder: Path, write_page_highlights: Callable[[Path, str, str, str], None]
+) -> None:
+    clock = FakeClock()
+    watcher = LibraryWatcher(xochitl_folder, WatchOptions(debounce_seconds=5), clock)
+    assert not watcher.poll()
+
+    write_page_highlights(xochitl_folder, XOCHITL_DOCUMENT_ID, "page_id_2", "text")
+    assert not watcher.poll()
+    clock.time = 4
+    touch(xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.content", 1)
+    assert not watcher.poll()
+    clock.time = 8
+    assert not watcher.poll()
+    clock.time = 9
+
+    assert watcher.poll() == {XOCHITL_DOCUMENT_ID}
+    assert watcher.poll() == set()
+
+
+def test_poll_gives_the_changes_after_the_max_wait_when_files_keep_changing(
+    xochitl_folder: Path,
+) -> None:
+    clock = FakeClock()
+    watcher = LibraryWatcher(
+        xochitl_folder, WatchOptions(debounce_seconds=5, max_wait_seconds=6), clock
+    )
+
+    for mtime in range(1, 3):
+        clock.time = mtime * 4
+        touch(xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.content", mtime)
+        assert not watcher.poll()
+    clock.time = 12
+    touch(xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.content", 3)
+
+    assert watcher.poll() == {XOCHITL_DOCUMENT_ID}
+
+
+def test_retry_gives_the_documents_again_after_the_debounce(xochitl_folder: Path) -> None:
+    clock = FakeClock()
+    watcher = LibraryWatcher(xochitl_folder, WatchOptions(debounce_seconds=5), clock)
+
+    assert not watcher.retry([XOCHITL_DOCUMENT_ID])
+    assert not watcher.poll()
+    clock.time = 5
+
+    assert watcher.poll() == {XOCHITL_DOCUMENT_ID}
+
+
+def test_retry_gives_up_a_document_until_its_files_change(xochitl_folder: Path) -> None:
+    watcher = LibraryWatcher(xochitl_folder, WatchOptions(debounce_seconds=0, max_retries=1))
+    assert not watcher.retry([XOCHITL_DOCUMENT_ID])
+    assert watcher.poll() == {XOCHITL_DOCUMENT_ID}
+
+    assert watcher.retry([XOCHITL_DOCUMENT_ID]) == {XOCHITL_DOCUMENT_ID}
+    assert not watcher.poll()
+
+    touch(xochitl_folder / f"{XOCHITL_DOCUMENT_ID}.content", 1)
+    assert watcher.poll() == {XOCHITL_DOCUMENT_ID}
+    assert not watcher.retry([XOCHITL_DOCUMENT_ID])
+
+
+def test_watch_library_exports_each_batch_until_stopped(
+    xochitl_folder: Path, write_page_highlights: Callable[[Path, str, str, str], None]
+) -> None:
+    watcher = LibraryWatcher(xochitl_folder, WatchOptions(debounce_seconds=0))
+    write_page_highlights(xochitl_folder, XOCHITL_DOCUMENT_ID, "page_id_0", "new text")
+    stop_event = threading.Event()
+    batches = []
+
+    def export_documents(changed_document_ids: set[str]) -> None:
+        batches.append(changed_document_ids)
+        stop_event.set()
+
+    watch_library(watcher, export_documents, poll_interval_seconds=0, stop_event=stop_event)
+
+    assert batches == [{XOCHITL_DOCUMENT_ID}]
@@ -1,7 +1,12 @@
+from pathlib import Path
 from typing import Callable
 
-from highlights_extractor.model_utils import sort_page_highlights
-from highlights_extractor.models import PageHighlights
+import pytest
+
+from highlights_extractor.config.exceptions import PageNotFoundError
+from highlights_extractor.model_utils import get_page_number, sort_page_highlights
+from highlights_extractor.models import DocumentContent, PageHighlights
+from highlights_extractor.repository.file_reader import RawFile, RawHighlightFile
 
 
 def test_sorting_page_highlights_without_already_sorted_list(
@@ -20,3 +25,31 @@ def test_sorting_page_highlights(make_page_highlights: Callable[[int], PageHighl
     pages = [page_0_highlights, page_1_highlights]
     sorted_pages = sort_page_highlights(pages)
     assert sorted_pages == [page_0_highlights, page_1_highlights]
+
+
+def test_get_page_number(
+    remarkable_document_content: DocumentContent,
+    make_remarkable_raw_highlights: Callable[[int], RawHighlightFile],
+) -> None:
+    assert get_page_number(remarkable_document_content, make_remarkable_raw_highlights(2)) == 2
+
+
+def test_get_page_number_of_a_page_not_in_the_content(
+    remarkable_document_content: DocumentContent,
+    make_remarkable_raw_highlights: Callable[[int], RawHighlightFile],
+) -> None:
+    with pytest.raises(PageNotFoundError):
+        get_page_number(remarkable_document_content, make_remarkable_raw_highlights(3))
+
+
+def test_get_page_number_of_a_page_without_page_number(
+    make_remarkable_raw_highlights: Callable[[int], RawHighlightFile],
+) -> None:
+    document_content = DocumentContent(
+        RawFile(
+            Path("doc_id.content"),
+            {"pages": ["page_id_1", "page_id_2"], "redirectionPageMap": [1]},
+        )
+    )
+    with pytest.raises(PageNotFoundError):
+        get_page_number(document_content, make_remarkable_raw_highlights(2))
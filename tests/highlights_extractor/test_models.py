@@ -0,0 +1,25 @@
+from pathlib import Path
+from typing import Callable
+
+from highlights_extractor.models import DocumentMetadata, PageHighlights
+from highlights_extractor.repository.file_reader import RawFile, RawHighlightFile
+
+
+def test_page_highlights_keep_only_the_highlighted_texts(
+    make_remarkable_raw_highlights: Callable[[int], RawHighlightFile],
+) -> None:
+    page_highlights = PageHighlights(make_remarkable_raw_highlights(1), 1)
+
+    assert not hasattr(page_highlights, "raw_file")
+    assert not hasattr(page_highlights, "__dict__")
+    assert (page_highlights.document_id, page_highlights.page_id) == ("doc_id", "page_id_1")
+    assert page_highlights.highlights == ["page_1_highlight_1", "page_1_highlight_2"]
+
+
+def test_document_metadata_does_not_keep_the_metadata_file() -> None:
+    document_metadata = DocumentMetadata(
+        RawFile(Path("doc_id.metadata"), {"visibleName": "doc", "lastModified": "1"})
+    )
+
+    assert not hasattr(document_metadata, "raw_file")
+    assert (document_metadata.document_id, document_metadata.document_name) == ("doc_id", "doc")
@@ -0,0 +1,69 @@
+import gc
+import os
+from pathlib import Path
+
+import fitz
+import pytest
+
+from highlights_extractor.pdf_document_pool import PDFDocumentPool
+from highlights_extractor.process_documents import PDFExtractor
+
+
+@pytest.fixture(name="pdf_paths")
+def get_pdf_paths(tmp_path: Path) -> list[Path]:
+    pdf_paths = []
+    for pdf_index in range(3):
+        pdf = fitz.open()
+        pdf.new_page()
+        pdf_paths.append(tmp_path / f"document_{pdf_index}.pdf")
+        pdf.save(pdf_paths[-1])
+    return pdf_paths
+
+
+def test_acquire_reuses_open_documents(pdf_paths: list[Path]) -> None:
+    document_pool = PDFDocumentPool()
+    first_lease = document_pool.acquire(pdf_paths[0])
+    document_pool.release(first_lease)
+
+    second_lease = document_pool.acquire(pdf_paths[0])
+
+    assert second_lease.document is first_lease.document
+    assert (document_pool.stats.hits, document_pool.stats.misses) == (1, 1)
+
+
+def test_acquire_opens_modified_documents_again(pdf_paths: list[Path]) -> None:
+    document_pool = PDFDocumentPool()
+    first_lease = document_pool.acquire(pdf_paths[0])
+    os.utime(pdf_paths[0], ns=(1, 1))
+
+    second_lease = document_pool.acquire(pdf_paths[0])
+
+    assert second_lease.document is not first_lease.document
+
+
+def test_release_closes_evicted_documents_only_when_not_leased(pdf_paths: list[Path]) -> None:
+    document_pool = PDFDocumentPool(max_documents=1)
+    leases = [document_pool.acquire(pdf_path) for pdf_path in pdf_paths]
+    assert len(document_pool) == 3
+    assert not any(lease.document.is_closed for lease in leases)
+
+    for lease in leases:
+        document_pool.release(lease)
+
+    assert len(document_pool) == 1
+    assert [lease.document.is_closed for lease in leases] == [True, True, False]
+    assert document_pool.stats.evictions == 2
+
+
+def test_pdf_extractor_gives_its_document_back_to_the_pool(pdf_paths: list[Path]) -> None:
+    document_pool = PDFDocumentPool(max_documents=0)
+    closed_extractor = PDFExtractor(pdf_paths[0], "document_0", document_pool=document_pool)
+    collected_extractor = PDFExtractor(pdf_paths[1], "document_1", document_pool=document_pool)
+    documents = [closed_extractor.reader, collected_extractor.reader]
+
+    closed_extractor.close()
+    del collected_extractor
+    gc.collect()
+
+    assert all(document.is_closed for document in documents)
+    assert len(document_pool) == 0
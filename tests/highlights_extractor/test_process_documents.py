@@ -1,8 +1,19 @@
 # pylint: disable=protected-access
+from pathlib import Path
+
 import pytest
+from PIL import Image
 
 from highlights_extractor.config.exceptions import DocumentNotProcessableError
-from highlights_extractor.process_documents import PDFExtractor, TableOfContentItem
+from highlights_extractor.models import ImageExportOptions, ImageFormat
+from highlights_extractor.process_documents import (
+    REMARKABLE_HEIGHT,
+    REMARKABLE_WIDTH,
+    PDFExtractor,
+    TableOfContentItem,
+)
+from highlights_extractor.repository.file_reader import Highlights, RawHighlightFile
+from highlights_extractor.repository.image_cache import PageImageCache
 from tests.constants import DATA_FOLDER
 
 
@@ -62,3 +73,201 @@ def test_get_chapter_title_from_a_page_not_in_the_table_of_content(
     page_number_not_in_the_table_of_content = -1
     with pytest.raises(DocumentNotProcessableError):
         pdf_reader.get_chapter_title(page_number_not_in_the_table_of_content)
+
+
+def test_get_chapter_title_with_chapters_starting_on_the_same_page(
+    pdf_reader: PDFExtractor,
+) -> None:
+    pdf_reader._get_raw_table_of_contents = lambda: [
+        TableOfContentItem(0, "toc_1", 0),
+        TableOfContentItem(1, "toc_1_1", 5),
+        TableOfContentItem(0, "toc_2", 5),
+    ]
+    assert pdf_reader.get_chapter_title(7) == "toc_1_1"
+
+
+def test_get_chapter_title_reads_the_table_of_contents_once(pdf_reader: PDFExtractor) -> None:
+    calls = []
+
+    def _get_raw_table_of_contents() -> list[TableOfContentItem]:
+        calls.append(1)
+        return [TableOfContentItem(0, "toc_1", 0), TableOfContentItem(0, "toc_2", 10)]
+
+    pdf_reader._get_raw_table_of_contents = _get_raw_table_of_contents
+    chapter_titles = [pdf_reader.get_chapter_title(page_number) for page_number in range(20)]
+    assert chapter_titles == ["toc_1"] * 10 + ["toc_2"] * 10
+    assert len(calls) == 1
+
+
+def test_get_chapter_titles(pdf_reader: PDFExtractor) -> None:
+    pdf_reader._get_raw_table_of_contents = lambda: [
+        TableOfContentItem(0, "toc_1", 0),
+        TableOfContentItem(0, "toc_2", 1),
+        TableOfContentItem(0, "toc_3", 10),
+    ]
+    chapter_titles = pdf_reader.get_chapter_titles([12, 0, 4, 10, 1])
+    assert chapter_titles == ["toc_3", "toc_1", "toc_2", "toc_3", "toc_2"]
+
+
+def test_get_chapter_titles_with_a_page_not_in_the_table_of_content(
+    pdf_reader: PDFExtractor,
+) -> None:
+    pdf_reader._get_raw_table_of_contents = lambda: [TableOfContentItem(0, "toc_1", 0)]
+    with pytest.raises(DocumentNotProcessableError):
+        pdf_reader.get_chapter_titles([3, -1])
+
+
+def test_get_chapter_titles_without_pages_does_not_need_a_table_of_contents() -> None:
+    pdf_reader = PDFExtractor(DATA_FOLDER / "not_a_book.pdf", "not_a_book")
+    assert not pdf_reader.get_chapter_titles([])
+
+
+@pytest.fixture(name="highlight_file")
+def get_highlight_file() -> RawHighlightFile:
+    return RawHighlightFile(
+        Path("doc_id.highlights/page_id.json"),
+        [
+            Highlights.from_dict(
+                {"text": "text", "rects": [{"x": 100, "y": 200, "width": 600, "height": 40}]}
+            )
+        ],
+    )
+
+
+def test_save_pages_images_in_parallel_is_the_same_as_in_serial(
+    tmp_path: Path, pdf_reader: PDFExtractor, highlight_file: RawHighlightFile
+) -> None:
+    page_numbers = (2, 0, 1)
+    serial_paths = list(
+        pdf_reader.save_pages_images(
+            [(page, highlight_file, tmp_path / f"serial_{page}.jpeg") for page in page_numbers]
+        )
+    )
+    parallel_paths = list(
+        PDFExtractor(pdf_reader.document_path, pdf_reader.document_name).save_pages_images(
+            [(page, highlight_file, tmp_path / f"parallel_{page}.jpeg") for page in page_numbers],
+            render_processes=2,
+        )
+    )
+    assert parallel_paths == [tmp_path / f"parallel_{page}.jpeg" for page in page_numbers]
+    assert [path.read_bytes() for path in parallel_paths] == [
+        path.read_bytes() for path in serial_paths
+    ]
+
+
+@pytest.mark.parametrize("image_format", list(ImageFormat))
+def test_save_page_image_in_each_format(
+    tmp_path: Path,
+    pdf_reader: PDFExtractor,
+    highlight_file: RawHighlightFile,
+    image_format: ImageFormat,
+) -> None:
+    file_path = tmp_path / f"page.{image_format.extension}"
+    pdf_reader.save_page_image(
+        1, highlight_file, file_path, export_options=ImageExportOptions(image_format, 80)
+    )
+    with Image.open(file_path) as image:
+        assert image.format == image_format.name
+        assert image.size == pdf_reader.get_page_image(1, highlight_file).size
+
+
+def test_save_page_image_twice_with_an_image_cache_renders_once(
+    tmp_path: Path, highlight_file: RawHighlightFile
+) -> None:
+    image_cache = PageImageCache(tmp_path / "cache")
+    pdf_reader = PDFExtractor(DATA_FOLDER / "software-craft.pdf", "software-craft", image_cache)
+    pdf_reader.save_page_image(1, highlight_file, tmp_path / "first.jpeg")
+
+    def _render_page_pixmap(*_: object) -> None:
+        raise AssertionError("the page should not be rendered again")
+
+    pdf_reader._render_page_pixmap = _render_page_pixmap
+    pdf_reader.save_page_image(1, highlight_file, tmp_path / "second.jpeg")
+
+    assert (tmp_path / "first.jpeg").read_bytes() == (tmp_path / "second.jpeg").read_bytes()
+    assert (image_cache.stats.hits, image_cache.stats.misses) == (1, 1)
+
+
+def test_get_highlights_boxes_scales_rects_to_the_pdf_page(pdf_reader: PDFExtractor) -> None:
+    pdf_page = pdf_reader.reader.load_page(0)
+    scale_x = pdf_page.rect.width / REMARKABLE_WIDTH
+    scale_y = pdf_page.rect.height / REMARKABLE_HEIGHT
+    rects = [
+        {"x": 100, "y": 200, "width": 600, "height": 40},
+        {"x": 0, "y": 0, "width": 1, "height": 2},
+    ]
+    highlight_contents = [
+        Highlights.from_dict({"text": "text", "rects": rects[:1]}),
+        Highlights.from_dict({"text": "text"}),
+        Highlights.from_dict({"text": "text", "rects": rects[1:]}),
+    ]
+
+    highlights_boxes = pdf_reader._get_highlights_boxes(highlight_contents, pdf_page)
+
+    assert [tuple(quad.rect) for quad in highlights_boxes] == [
+        pytest.approx(
+            (
+                rect["x"] * scale_x,
+                rect["y"] * scale_y,
+                (rect["x"] + rect["width"]) * scale_x,
+                (rect["y"] + rect["height"]) * scale_y,
+            )
+        )
+        for rect in rects
+    ]
+    assert highlights_boxes[0].is_rectangular
+
+
+def test_get_highlights_boxes_without_rects(pdf_reader: PDFExtractor) -> None:
+    pdf_page = pdf_reader.reader.load_page(0)
+    assert (
+        pdf_reader._get_highlights_boxes([Highlights.from_dict({"text": "text"})], pdf_page) == []
+    )
+
+
+def test_get_page_image_clipped_to_the_highlights(
+    pdf_reader: PDFExtractor, highlight_file: RawHighlightFile
+) -> None:
+    pdf_page = pdf_reader.reader.load_page(1)
+    highlight_box = pdf_reader._get_highlights_boxes(highlight_file.content, pdf_page)[0].rect
+
+    image = pdf_reader.get_page_image(1, highlight_file, image_zoom=2, clip_padding=10)
+
+    assert image.size == pytest.approx(
+        ((highlight_box.width + 20) * 2, (highlight_box.height + 20) * 2), abs=2
+    )
+
+
+def test_get_clip_rect_stays_inside_the_page(pdf_reader: PDFExtractor) -> None:
+    pdf_page = pdf_reader.reader.load_page(0)
+    highlight_contents = [
+        Highlights.from_dict(
+            {"text": "text", "rects": [{"x": 0, "y": 0, "width": 100, "height": 40}]}
+        ),
+        Highlights.from_dict(
+            {"text": "text", "rects": [{"x": 200, "y": 400, "width": 100, "height": 40}]}
+        ),
+    ]
+    highlights_boxes = pdf_reader._get_highlights_boxes(highlight_contents, pdf_page)
+
+    clip = pdf_reader._get_clip_rect(highlights_boxes, pdf_page, 10)
+
+    assert (clip.x0, clip.y0) == (0, 0)
+    assert (clip.x1, clip.y1) == pytest.approx(
+        (highlights_boxes[1].rect.x1 + 10, highlights_boxes[1].rect.y1 + 10)
+    )
+    assert pdf_reader._get_clip_rect([], pdf_page, 10) is None
+
+
+def test_save_clipped_page_image_is_smaller_than_the_page(
+    tmp_path: Path, pdf_reader: PDFExtractor, highlight_file: RawHighlightFile
+) -> None:
+    pdf_reader.save_page_image(1, highlight_file, tmp_path / "page.jpeg")
+    pdf_reader.save_page_image(
+        1,
+        highlight_file,
+        tmp_path / "clipped.jpeg",
+        export_options=ImageExportOptions(clip_padding=10),
+    )
+
+    assert (tmp_path / "clipped.jpeg").stat().st_size < (tmp_path / "page.jpeg").stat().st_size
@@ -5,6 +5,7 @@ import pytest
 from highlights_extractor.path_utils import (
     extract_document_id_from_path,
     extract_page_id_from_path,
+    iter_all_dicts,
 )
 
 
@@ -50,3 +51,17 @@ def test_extract_page_id_from_path_should_raise_value_error_with_not_expected_fi
     )
     with pytest.raises(ValueError):
         extract_document_id_from_path(path)
+
+
+def test_iter_all_dicts_keeps_the_order_of_nested_lists() -> None:
+    nested_lists = [{"id": 0}, [[{"id": 1}], {"id": 2}], [], [[[{"id": 3}]]], {"id": 4}]
+
+    assert [dictionary["id"] for dictionary in iter_all_dicts(nested_lists)] == [0, 1, 2, 3, 4]
+
+
+def test_iter_all_dicts_with_deeply_nested_lists() -> None:
+    nested_lists: list = [{"id": 0}]
+    for _ in range(5000):
+        nested_lists = [nested_lists]
+
+    assert list(iter_all_dicts(nested_lists)) == [{"id": 0}]